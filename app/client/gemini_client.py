@@ -1,9 +1,15 @@
 import google.generativeai as genai
+import asyncio
 import json
 import os
+import random
 import re
+import time
+from collections import deque
 from typing import List, Dict, Any
 from app.models.schemas import FunctionCall
+from app.client.prompt_cache import PromptCache
+from app.client.intent_classifier import IntentClassifier
 from app.config import Config
 
 class GeminiClient:
@@ -15,6 +21,11 @@ class GeminiClient:
         # Initialize the model
         self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
         
+        # Cache of prompt decisions; functions whose parameters copy text out of the
+        # prompt are not cached because the cache key ignores case
+        self.prompt_cache = PromptCache() if Config.PROMPT_CACHE_ENABLED else None
+        self.uncacheable_functions = {"replace_text", "text_to_speech"}
+        
         # Define available functions for the LLM
         self.available_functions = {
             "compress_image": {
@@ -23,7 +34,8 @@ class GeminiClient:
                     "quality": "Image quality (1-100, default: 85)",
                     "max_width": "Maximum width in pixels (optional)",
                     "max_height": "Maximum height in pixels (optional)",
-                    "format": "Output format (JPEG, PNG, WEBP)"
+                    "format": "Output format (JPEG, PNG, WEBP)",
+                    "target_size_kb": "Maximum size of each compressed image in KB (optional, e.g. 200)"
                 },
                 "triggers": ["compress", "reduce size", "smaller", "optimize", "quality", "resize"]
             },
@@ -41,7 +53,8 @@ class GeminiClient:
                 "parameters": {
                     "page_size": "Page size (A4, Letter, Legal)",
                     "orientation": "Page orientation (portrait, landscape)",
-                    "margin": "Page margin in points"
+                    "margin": "Page margin in points",
+                    "dpi": "Maximum image resolution in the PDF (e.g. 150, 300; 0 keeps the original resolution)"
                 },
                 "triggers": ["image to pdf", "photo to pdf", "picture to pdf", "img to pdf"]
             },
@@ -52,8 +65,9 @@ class GeminiClient:
             },            "replace_text": {
                 "description": "Extract archives and replace text/keywords in all files",
                 "parameters": {
-                    "old_keyword": "Text to find and replace",
-                    "new_keyword": "Replacement text",
+                    "find_text": "Text to find and replace",
+                    "replace_text": "Replacement text",
+                    "replacements": "List of {\"find\": ..., \"replace\": ...} pairs when several texts are replaced at once",
                     "case_sensitive": "Whether replacement should be case sensitive (default: false)"
                 },
                 "triggers": ["replace text", "find and replace", "change keyword", "substitute text", "replace word"]
@@ -76,8 +90,46 @@ class GeminiClient:
             }
         }
     
+        # Local classifier that answers unambiguous prompts without calling Gemini
+        self.intent_classifier = (
+            IntentClassifier(self.available_functions, Config.INTENT_FAST_PATH_MIN_CONFIDENCE)
+            if Config.INTENT_FAST_PATH_ENABLED else None
+        )
+        self.routing_stats = {
+            "local": 0,
+            "llm": 0,
+            "llm_latency_ema_ms": None,
+            "llm_retries": 0,
+            "llm_hedged": 0,
+            "llm_timeouts": 0,
+            "keyword_fallbacks": 0
+        }
+        # Recent Gemini latencies (seconds) used to pick the hedging delay
+        self._llm_latencies = deque(maxlen=200)
+    
     async def parse_prompt_for_function(self, prompt: str, file_paths: List[str]) -> FunctionCall:
         """Parse user prompt to determine which function to call and extract parameters"""
+        if self.intent_classifier is not None:
+            start_time = time.perf_counter()
+            function_call, scores = self.intent_classifier.classify(prompt, file_paths)
+            classify_ms = (time.perf_counter() - start_time) * 1000
+            
+            if function_call is not None:
+                self.routing_stats["local"] += 1
+                saved_ms = self.routing_stats["llm_latency_ema_ms"]
+                saved_info = f"~{saved_ms:.0f}ms LLM call skipped" if saved_ms is not None else "LLM call skipped"
+                print(f"Intent routing: local -> {function_call.function_name} "
+                      f"(confidence {function_call.confidence:.2f}, {classify_ms:.2f}ms, {saved_info})")
+                return function_call
+            
+            top_scores = {name: score for name, score in scores.items() if score}
+            print(f"Intent routing: llm (local scores {top_scores or 'none'}, {classify_ms:.2f}ms)")
+        
+        self.routing_stats["llm"] += 1
+        return await self.parse_prompt_with_llm(prompt, file_paths)
+    
+    async def parse_prompt_with_llm(self, prompt: str, file_paths: List[str]) -> FunctionCall:
+        """Ask Gemini which function to call, falling back to keyword matching"""
         
         # Create function descriptions for the prompt
         functions_desc = "\n".join([
@@ -87,10 +139,18 @@ class GeminiClient:
         
         # Analyze file types if files are provided
         file_info = ""
+        file_extensions = [os.path.splitext(path)[1].lower() for path in file_paths]
         if file_paths:
-            file_extensions = [os.path.splitext(path)[1].lower() for path in file_paths]
             file_info = f"\nUploaded files: {', '.join(file_extensions)}"
         
+        cache_key = None
+        if self.prompt_cache is not None:
+            cache_key = PromptCache.make_key(prompt, file_extensions)
+            cached = self.prompt_cache.get(cache_key)
+            if cached is not None:
+                print(f"Prompt cache hit: {cached['function_name']}")
+                return FunctionCall(**cached)
+        
         system_prompt = f"""
 You are a function calling assistant. Based on the user's prompt and uploaded files, determine which function to call and extract the appropriate parameters.
 
@@ -116,10 +176,10 @@ User prompt: "{prompt}"
 """
         
         try:
-            response = self.model.generate_content(system_prompt)
+            response_text = await self._call_llm(system_prompt)
             
             # Parse the JSON response
-            response_text = response.text.strip()
+            response_text = response_text.strip()
             
             # Clean up the response to extract JSON
             if "```json" in response_text:
@@ -129,166 +189,282 @@ User prompt: "{prompt}"
             
             function_data = json.loads(response_text)
             
-            return FunctionCall(
+            function_call = FunctionCall(
                 function_name=function_data["function_name"],
                 parameters=function_data["parameters"],
                 confidence=function_data["confidence"]
             )
             
+            if cache_key is not None and function_call.function_name not in self.uncacheable_functions:
+                self.prompt_cache.put(cache_key, {
+                    "function_name": function_call.function_name,
+                    "parameters": function_call.parameters,
+                    "confidence": function_call.confidence
+                })
+            
+            return function_call
+            
+        except asyncio.TimeoutError:
+            self.routing_stats["llm_timeouts"] += 1
+            if Config.GEMINI_TIMEOUT_FALLBACK != 'keyword':
+                raise TimeoutError(f"Gemini did not respond within {Config.GEMINI_DEADLINE_SECONDS}s")
+            print(f"Gemini timed out after {Config.GEMINI_DEADLINE_SECONDS}s, using keyword fallback")
+            self.routing_stats["keyword_fallbacks"] += 1
+            return self._keyword_fallback(prompt)
         except Exception as e:
-            # Fallback: Try to determine function based on keywords
-            prompt_lower = prompt.lower()
+            print(f"Gemini call failed ({str(e)}), using keyword fallback")
+            self.routing_stats["keyword_fallbacks"] += 1
+            return self._keyword_fallback(prompt)
+    
+    def _keyword_fallback(self, prompt: str) -> FunctionCall:
+        """Try to determine function based on keywords"""
+        prompt_lower = prompt.lower()
+        
+        if any(trigger in prompt_lower for trigger in self.available_functions["compress_image"]["triggers"]):
+            return FunctionCall(
+                function_name="compress_image",
+                parameters={"quality": 85, "format": "JPEG"},
+                confidence=0.7
+            )
+        elif any(trigger in prompt_lower for trigger in self.available_functions["word_to_pdf"]["triggers"]):
+            return FunctionCall(
+                function_name="word_to_pdf",
+                parameters={"page_size": "A4", "orientation": "portrait"},
+                confidence=0.7
+            )
+        elif any(trigger in prompt_lower for trigger in self.available_functions["image_to_pdf"]["triggers"]):                return FunctionCall(
+                function_name="image_to_pdf",
+                parameters={"page_size": "A4", "orientation": "portrait"},
+                confidence=0.7
+            )
+        elif any(trigger in prompt_lower for trigger in self.available_functions["extract_files"]["triggers"]):
+            return FunctionCall(
+                function_name="extract_files",
+                parameters={},
+                confidence=0.7
+            )
+        elif any(trigger in prompt_lower for trigger in self.available_functions["replace_text"]["triggers"]):
+            # Try to extract keywords from prompt
+            old_keyword = "IITM"  # default
+            new_keyword = "IIT Madras"  # default
             
-            if any(trigger in prompt_lower for trigger in self.available_functions["compress_image"]["triggers"]):
-                return FunctionCall(
-                    function_name="compress_image",
-                    parameters={"quality": 85, "format": "JPEG"},
-                    confidence=0.7
-                )
-            elif any(trigger in prompt_lower for trigger in self.available_functions["word_to_pdf"]["triggers"]):
-                return FunctionCall(
-                    function_name="word_to_pdf",
-                    parameters={"page_size": "A4", "orientation": "portrait"},
-                    confidence=0.7
-                )
-            elif any(trigger in prompt_lower for trigger in self.available_functions["image_to_pdf"]["triggers"]):                return FunctionCall(
-                    function_name="image_to_pdf",
-                    parameters={"page_size": "A4", "orientation": "portrait"},
-                    confidence=0.7
-                )
-            elif any(trigger in prompt_lower for trigger in self.available_functions["extract_files"]["triggers"]):
-                return FunctionCall(
-                    function_name="extract_files",
-                    parameters={},
-                    confidence=0.7
-                )
-            elif any(trigger in prompt_lower for trigger in self.available_functions["replace_text"]["triggers"]):
-                # Try to extract keywords from prompt
-                old_keyword = "IITM"  # default
-                new_keyword = "IIT Madras"  # default
-                
-                # Simple pattern matching for replacement
-                replace_patterns = [
-                    r'replace["\s]+([^"]+)["\s]+with["\s]+([^"]+)',
-                    r'change["\s]+([^"]+)["\s]+to["\s]+([^"]+)',
-                    r'substitute["\s]+([^"]+)["\s]+with["\s]+([^"]+)'
-                ]
-                
-                for pattern in replace_patterns:
-                    match = re.search(pattern, prompt_lower)
-                    if match:
-                        old_keyword = match.group(1).strip(' "\'')
-                        new_keyword = match.group(2).strip(' "\'')
-                        break
-                
-                return FunctionCall(
-                    function_name="replace_text",
-                    parameters={
-                        "find_text": old_keyword,
-                        "replace_text": new_keyword,
-                        "case_sensitive": False
-                    },
-                    confidence=0.7
-                )
-            elif any(trigger in prompt_lower for trigger in self.available_functions["speech_to_text"]["triggers"]):
-                # Detect language from prompt
-                language = "hindi"  # default
-                
-                # Simple language detection
-                language_keywords = {
-                    "hindi": ["hindi", "हिंदी"],
-                    "gujarati": ["gujarati", "ગુજરાતી"],
-                    "english": ["english", "angrezi"],
-                    "punjabi": ["punjabi", "ਪੰਜਾਬੀ"],
-                    "marathi": ["marathi", "मराठी"],
-                    "bengali": ["bengali", "বাংলা"],
-                    "tamil": ["tamil", "தமிழ்"],
-                    "telugu": ["telugu", "తెలుగు"],
-                    "kannada": ["kannada", "ಕನ್ನಡ"],
-                    "malayalam": ["malayalam", "മലയാളം"]
-                }
-                
-                for lang, keywords in language_keywords.items():
-                    if any(keyword in prompt_lower for keyword in keywords):
-                        language = lang
-                        break
-                
-                return FunctionCall(
-                    function_name="speech_to_text",
-                    parameters={
-                        "language": language,                        "model": "saarika:v2"
-                    },
-                    confidence=0.8
-                )
-            elif any(trigger in prompt_lower for trigger in self.available_functions["text_to_speech"]["triggers"]):
-                # Detect language from prompt
-                language = "hindi"  # default
-                
-                # Simple language detection
-                language_keywords = {
-                    "hindi": ["hindi", "हिंदी"],
-                    "gujarati": ["gujarati", "ગુજરાતી"],
-                    "english": ["english", "angrezi"],
-                    "punjabi": ["punjabi", "ਪੰਜਾਬੀ"],
-                    "marathi": ["marathi", "मराठी"],
-                    "bengali": ["bengali", "বাংলা"],
-                    "tamil": ["tamil", "தமிழ்"],
-                    "telugu": ["telugu", "తెలుగు"],
-                    "kannada": ["kannada", "ಕನ್ನಡ"],
-                    "malayalam": ["malayalam", "മലയാളം"]
-                }
-                
-                for lang, keywords in language_keywords.items():
-                    if any(keyword in prompt_lower for keyword in keywords):
-                        language = lang
-                        break
-                
-                # Try to extract text from prompt
-                text_to_convert = ""
-                
-                # Look for quoted text in the prompt
-                text_patterns = [
-                    r'"([^"]+)"',  # Text in double quotes
-                    r"'([^']+)'",  # Text in single quotes
-                    r'text[:\s]+"([^"]+)"',  # "text: "..."
-                    r'say[:\s]+"([^"]+)"',   # "say: "..."
-                    r'speak[:\s]+"([^"]+)"'  # "speak: "..."
-                ]
-                
-                for pattern in text_patterns:
-                    match = re.search(pattern, prompt, re.IGNORECASE)
-                    if match:
-                        text_to_convert = match.group(1)
-                        break
+            # Simple pattern matching for replacement
+            replace_patterns = [
+                r'replace["\s]+([^"]+)["\s]+with["\s]+([^"]+)',
+                r'change["\s]+([^"]+)["\s]+to["\s]+([^"]+)',
+                r'substitute["\s]+([^"]+)["\s]+with["\s]+([^"]+)'
+            ]
+            
+            for pattern in replace_patterns:
+                match = re.search(pattern, prompt_lower)
+                if match:
+                    old_keyword = match.group(1).strip(' "\'')
+                    new_keyword = match.group(2).strip(' "\'')
+                    break
+            
+            return FunctionCall(
+                function_name="replace_text",
+                parameters={
+                    "find_text": old_keyword,
+                    "replace_text": new_keyword,
+                    "case_sensitive": False
+                },
+                confidence=0.7
+            )
+        elif any(trigger in prompt_lower for trigger in self.available_functions["speech_to_text"]["triggers"]):
+            # Detect language from prompt
+            language = "hindi"  # default
+            
+            # Simple language detection
+            language_keywords = {
+                "hindi": ["hindi", "हिंदी"],
+                "gujarati": ["gujarati", "ગુજરાતી"],
+                "english": ["english", "angrezi"],
+                "punjabi": ["punjabi", "ਪੰਜਾਬੀ"],
+                "marathi": ["marathi", "मराठी"],
+                "bengali": ["bengali", "বাংলা"],
+                "tamil": ["tamil", "தமிழ்"],
+                "telugu": ["telugu", "తెలుగు"],
+                "kannada": ["kannada", "ಕನ್ನಡ"],
+                "malayalam": ["malayalam", "മലയാളം"]
+            }
+            
+            for lang, keywords in language_keywords.items():
+                if any(keyword in prompt_lower for keyword in keywords):
+                    language = lang
+                    break
+            
+            return FunctionCall(
+                function_name="speech_to_text",
+                parameters={
+                    "language": language,                        "model": "saarika:v2"
+                },
+                confidence=0.8
+            )
+        elif any(trigger in prompt_lower for trigger in self.available_functions["text_to_speech"]["triggers"]):
+            # Detect language from prompt
+            language = "hindi"  # default
+            
+            # Simple language detection
+            language_keywords = {
+                "hindi": ["hindi", "हिंदी"],
+                "gujarati": ["gujarati", "ગુજરાતી"],
+                "english": ["english", "angrezi"],
+                "punjabi": ["punjabi", "ਪੰਜਾਬੀ"],
+                "marathi": ["marathi", "मराठी"],
+                "bengali": ["bengali", "বাংলা"],
+                "tamil": ["tamil", "தமிழ்"],
+                "telugu": ["telugu", "తెలుగు"],
+                "kannada": ["kannada", "ಕನ್ನಡ"],
+                "malayalam": ["malayalam", "മലയാളം"]
+            }
+            
+            for lang, keywords in language_keywords.items():
+                if any(keyword in prompt_lower for keyword in keywords):
+                    language = lang
+                    break
+            
+            # Try to extract text from prompt
+            text_to_convert = ""
+            
+            # Look for quoted text in the prompt
+            text_patterns = [
+                r'"([^"]+)"',  # Text in double quotes
+                r"'([^']+)'",  # Text in single quotes
+                r'text[:\s]+"([^"]+)"',  # "text: "..."
+                r'say[:\s]+"([^"]+)"',   # "say: "..."
+                r'speak[:\s]+"([^"]+)"'  # "speak: "..."
+            ]
+            
+            for pattern in text_patterns:
+                match = re.search(pattern, prompt, re.IGNORECASE)
+                if match:
+                    text_to_convert = match.group(1)
+                    break
+            
+            # If no quoted text found, use the whole prompt as text (minus the command part)
+            if not text_to_convert:
+                # Remove common TTS trigger words from the beginning
+                clean_prompt = prompt
+                for trigger in self.available_functions["text_to_speech"]["triggers"]:
+                    clean_prompt = re.sub(r'^' + re.escape(trigger) + r'\s*', '', clean_prompt, flags=re.IGNORECASE)
                 
-                # If no quoted text found, use the whole prompt as text (minus the command part)
-                if not text_to_convert:
-                    # Remove common TTS trigger words from the beginning
-                    clean_prompt = prompt
-                    for trigger in self.available_functions["text_to_speech"]["triggers"]:
-                        clean_prompt = re.sub(r'^' + re.escape(trigger) + r'\s*', '', clean_prompt, flags=re.IGNORECASE)
-                    
-                    # Remove language specifications
-                    for lang in language_keywords.keys():
-                        clean_prompt = re.sub(r'\b' + re.escape(lang) + r'\b', '', clean_prompt, flags=re.IGNORECASE)
-                    
-                    clean_prompt = clean_prompt.strip()
-                    if clean_prompt and len(clean_prompt) > 5:  # Ensure there's meaningful text
-                        text_to_convert = clean_prompt
+                # Remove language specifications
+                for lang in language_keywords.keys():
+                    clean_prompt = re.sub(r'\b' + re.escape(lang) + r'\b', '', clean_prompt, flags=re.IGNORECASE)
                 
-                return FunctionCall(
-                    function_name="text_to_speech",
-                    parameters={
-                        "text": text_to_convert,
-                        "language": language,
-                        "format": "wav"
-                    },
-                    confidence=0.8
-                )
-            else:
-                # Default to image compression if files are uploaded
-                return FunctionCall(
-                    function_name="compress_image",
-                    parameters={"quality": 85, "format": "JPEG"},
-                    confidence=0.5
+                clean_prompt = clean_prompt.strip()
+                if clean_prompt and len(clean_prompt) > 5:  # Ensure there's meaningful text
+                    text_to_convert = clean_prompt
+            
+            return FunctionCall(
+                function_name="text_to_speech",
+                parameters={
+                    "text": text_to_convert,
+                    "language": language,
+                    "format": "wav"
+                },
+                confidence=0.8
+            )
+        else:
+            # Default to image compression if files are uploaded
+            return FunctionCall(
+                function_name="compress_image",
+                parameters={"quality": 85, "format": "JPEG"},
+                confidence=0.5
+            )
+    
+    async def _call_llm(self, system_prompt: str) -> str:
+        """Call Gemini with a per-attempt timeout, an overall deadline and jittered exponential backoff
+        
+        Raises asyncio.TimeoutError if the deadline passes without a response.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.GEMINI_DEADLINE_SECONDS
+        last_error = None
+        
+        for attempt in range(Config.GEMINI_MAX_RETRIES + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            
+            try:
+                return await asyncio.wait_for(
+                    self._generate_hedged(system_prompt),
+                    timeout=min(Config.GEMINI_CALL_TIMEOUT_SECONDS, remaining)
                 )
+            except asyncio.TimeoutError as e:
+                last_error = e
+                print(f"Gemini attempt {attempt + 1} timed out")
+            except Exception as e:
+                last_error = e
+                print(f"Gemini attempt {attempt + 1} failed: {str(e)}")
+            
+            if attempt == Config.GEMINI_MAX_RETRIES:
+                break
+            backoff = Config.GEMINI_BACKOFF_BASE_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.0)
+            if loop.time() + backoff >= deadline:
+                break
+            self.routing_stats["llm_retries"] += 1
+            await asyncio.sleep(backoff)
+        
+        if last_error is None or isinstance(last_error, asyncio.TimeoutError):
+            raise asyncio.TimeoutError()
+        raise last_error
+    
+    async def _generate_hedged(self, system_prompt: str) -> str:
+        """Run one Gemini request, firing a second one if the first is slower than the recent p95"""
+        hedge_delay = self._hedge_delay()
+        first = asyncio.ensure_future(self._generate(system_prompt))
+        if hedge_delay is None:
+            return await first
+        
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                self.routing_stats["llm_hedged"] += 1
+                tasks.add(asyncio.ensure_future(self._generate(system_prompt)))
+            
+            # Return the first success; only fail once every request has failed
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not tasks:
+                    raise next(iter(done)).exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _generate(self, system_prompt: str) -> str:
+        """One async Gemini request; returns the response text"""
+        start_time = time.perf_counter()
+        response = await self.model.generate_content_async(system_prompt)
+        self._record_llm_latency(time.perf_counter() - start_time)
+        return response.text
+    
+    def _hedge_delay(self):
+        """Get the recent p95 latency to hedge after, or None if hedging is off or there is too little data"""
+        if not Config.GEMINI_HEDGE_ENABLED or len(self._llm_latencies) < Config.GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._llm_latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+    
+    def _record_llm_latency(self, latency_seconds: float):
+        """Track recent Gemini round-trip times and their exponential moving average"""
+        self._llm_latencies.append(latency_seconds)
+        latency_ms = latency_seconds * 1000
+        previous = self.routing_stats["llm_latency_ema_ms"]
+        self.routing_stats["llm_latency_ema_ms"] = latency_ms if previous is None else 0.8 * previous + 0.2 * latency_ms
+    
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Get counts of prompts routed locally vs. to Gemini, and Gemini call outcomes"""
+        stats = dict(self.routing_stats)
+        stats["llm_hedge_delay_ms"] = round(self._hedge_delay() * 1000, 1) if self._hedge_delay() is not None else None
+        return stats
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get prompt cache hit/miss counters"""
+        return self.prompt_cache.stats() if self.prompt_cache is not None else None
@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from app.models.schemas import FunctionCall
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
+AUDIO_EXTENSIONS = ['.wav', '.mp3', '.m4a', '.flac', '.aac', '.ogg', '.webm']
+TEXT_EXTENSIONS = ['.txt', '.md']
+
+# Which functions can act on each uploaded file type
+EXTENSION_PRIORS = {
+    **{ext: {"compress_image", "image_to_pdf"} for ext in IMAGE_EXTENSIONS},
+    **{ext: {"speech_to_text"} for ext in AUDIO_EXTENSIONS},
+    **{ext: {"text_to_speech"} for ext in TEXT_EXTENSIONS},
+    '.docx': {"word_to_pdf", "text_to_speech"},
+    '.zip': {"extract_files", "replace_text"}
+}
+
+# Patterns beyond the plain trigger phrases, with the score each adds
+EXTRA_PATTERNS = {
+    "compress_image": [(r'\bcompress\w*\b', 2), (r'\b\d{1,3}\s*%', 1), (r'\b\d{3,5}\s*[x×]\s*\d{3,5}\b', 1)],
+    # A bare "pdf" counts for both converters; the file extension priors pick one
+    "image_to_pdf": [(r'\b(images?|photos?|pictures?|scans?|jpe?gs?|pngs?)\b.*\bpdf\b', 3),
+                     (r'\bpdf\b.*\b(images?|photos?|pictures?|scans?)\b', 3), (r'\bpdf\b', 1)],
+    "word_to_pdf": [(r'\b(word|docx?|documents?)\b.*\bpdf\b', 3),
+                    (r'\bpdf\b.*\b(word|docx?|documents?)\b', 3), (r'\bpdf\b', 1)],
+    "extract_files": [(r'\b(unzip|extract)\w*\b', 2)],
+    "replace_text": [(r'\breplace\b.+\bwith\b', 3), (r'\bchange\b.+\bto\b', 2), (r'\bfind and replace\b', 3)],
+    "speech_to_text": [(r'\btranscri\w*\b', 2)],
+    "text_to_speech": [(r'\b(read aloud|speak|say|pronounce)\b', 2)]
+}
+
+# Keywords of another converter; a winner whose prompt also names one is left to the LLM
+CONFLICTING_KEYWORDS = {
+    "compress_image": re.compile(r'\bpdf\b', re.IGNORECASE),
+    "image_to_pdf": re.compile(r'\bcompress\w*\b', re.IGNORECASE),
+    "word_to_pdf": re.compile(r'\bcompress\w*\b', re.IGNORECASE)
+}
+# A negation up to two words before a match ("don't compress", "without the pdf")
+NEGATED = re.compile(r"\b(?:don[’']?t|do not|doesn[’']?t|does not|never|not|no|without)\s+(?:\w+\s+){0,2}$", re.IGNORECASE)
+
+LANGUAGE_KEYWORDS = {
+    "hindi": ["hindi", "हिंदी"],
+    "gujarati": ["gujarati", "ગુજરાતી"],
+    "english": ["english", "angrezi"],
+    "punjabi": ["punjabi", "ਪੰਜਾਬੀ"],
+    "marathi": ["marathi", "मराठी"],
+    "bengali": ["bengali", "বাংলা"],
+    "tamil": ["tamil", "தமிழ்"],
+    "telugu": ["telugu", "తెలుగు"],
+    "kannada": ["kannada", "ಕನ್ನಡ"],
+    "malayalam": ["malayalam", "മലയാളം"],
+    "odia": ["odia", "oriya", "ଓଡ଼ିଆ"],
+    "assamese": ["assamese", "অসমীয়া"]
+}
+
+QUOTED = r'"([^"]+)"|\'([^\']+)\'|“([^”]+)”'
+QUOTED_TEXT = re.compile(QUOTED)
+# Each quote must close with its own kind, so "it's" stays one string
+REPLACE_PAIR = re.compile(
+    r'(?:' + QUOTED + r')\s*(?:with|to|by|into|->|=>)\s*(?:' + QUOTED + r')',
+    re.IGNORECASE
+)
+# A quote left over once the quoted strings are removed, other than an apostrophe inside a word
+STRAY_QUOTE = re.compile(r'["“”]|(?<!\w)\'|\'(?!\w)')
+QUALITY = re.compile(r'\bquality\s*(?:of|to|at|=|:)?\s*(\d{1,3})\b|\b(\d{1,3})\s*%\s*quality\b|\b(\d{1,3})\s*%', re.IGNORECASE)
+DIMENSIONS = re.compile(r'\b(\d{3,5})\s*[x×]\s*(\d{3,5})\b')
+IMAGE_FORMAT = re.compile(r'\b(?:to|as|into|in)\s+(jpe?g|png|webp)\b', re.IGNORECASE)
+PAGE_SIZE = re.compile(r'\b(a4|letter|legal)\b', re.IGNORECASE)
+ORIENTATION = re.compile(r'\b(landscape|portrait)\b', re.IGNORECASE)
+MARGIN_POINTS = re.compile(r'\b(\d{1,3})\s*(?:pt|points?)\s+margins?\b', re.IGNORECASE)
+MARGIN_INCHES = re.compile(r'\b(\d(?:\.\d+)?)[- ]?inch(?:es)?\s+margins?\b', re.IGNORECASE)
+DPI = re.compile(r'\b(\d{2,4})\s*dpi\b', re.IGNORECASE)
+
+class IntentClassifier:
+    """Local prompt classifier used before asking Gemini
+
+    All trigger phrases are compiled into one alternation regex, so a prompt is
+    matched in a single pass. Scores from triggers and extra patterns are combined
+    with priors from the uploaded file extensions. A FunctionCall is returned only
+    when one function clearly wins and its parameters could be extracted.
+    """
+
+    def __init__(self, available_functions: Dict[str, Dict[str, Any]], min_confidence: float = 0.85):
+        self.min_confidence = min_confidence
+        self.function_names = list(available_functions.keys())
+
+        self.trigger_owner = {}
+        for name, info in available_functions.items():
+            for trigger in info.get("triggers", []):
+                self.trigger_owner.setdefault(trigger.lower(), name)
+
+        # Longest triggers first so "image to pdf" wins over shorter overlaps
+        triggers = sorted(self.trigger_owner, key=len, reverse=True)
+        self.trigger_pattern = re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in triggers) + r')\b', re.IGNORECASE)
+        self.extra_patterns = {
+            name: [(re.compile(pattern, re.IGNORECASE), score) for pattern, score in patterns]
+            for name, patterns in EXTRA_PATTERNS.items()
+        }
+
+    def classify(self, prompt: str, file_paths: List[str]) -> Tuple[Optional[FunctionCall], Dict[str, int]]:
+        """Classify a prompt; returns (FunctionCall or None when not confident, scores)"""
+        scores = {name: 0 for name in self.function_names}
+        negated = False
+
+        for match in self.trigger_pattern.finditer(prompt):
+            owner = self.trigger_owner[match.group(0).lower()]
+            scores[owner] += 1 + match.group(0).count(' ')
+            negated = negated or bool(NEGATED.search(prompt, 0, match.start()))
+
+        for name, patterns in self.extra_patterns.items():
+            for pattern, score in patterns:
+                match = pattern.search(prompt)
+                if match:
+                    scores[name] += score
+                    negated = negated or bool(NEGATED.search(prompt, 0, match.start()))
+
+        extensions = {os.path.splitext(path)[1].lower() for path in file_paths}
+        if extensions:
+            allowed = set()
+            for ext in extensions:
+                allowed |= EXTENSION_PRIORS.get(ext, set())
+            scores = {name: (score if name in allowed else 0) for name, score in scores.items()}
+        else:
+            # Everything except text-to-speech needs an uploaded file
+            scores = {name: (score if name == "text_to_speech" else 0) for name, score in scores.items()}
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_name, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+
+        # Keyword scores cannot tell "compress" from "don't compress"
+        if best_score == 0 or negated:
+            return None, scores
+
+        # Confidence grows with the winning margin
+        margin = (best_score - runner_up) / best_score
+        confidence = round(0.6 + 0.35 * margin + min(0.05, 0.01 * best_score), 3)
+        if confidence < self.min_confidence:
+            return None, scores
+        conflict = CONFLICTING_KEYWORDS.get(best_name)
+        if conflict is not None and conflict.search(prompt):
+            return None, scores
+
+        parameters = self._extract_parameters(best_name, prompt, file_paths)
+        if parameters is None:
+            return None, scores
+
+        return FunctionCall(function_name=best_name, parameters=parameters, confidence=confidence), scores
+
+    def _extract_parameters(self, function_name: str, prompt: str, file_paths: List[str]) -> Optional[Dict[str, Any]]:
+        """Pull parameters out of the prompt; None means the prompt needs the LLM"""
+        parameters = {}
+
+        if function_name == "compress_image":
+            quality = QUALITY.search(prompt)
+            if quality:
+                value = next(group for group in quality.groups() if group)
+                parameters["quality"] = max(1, min(100, int(value)))
+            dimensions = DIMENSIONS.search(prompt)
+            if dimensions:
+                parameters["max_width"] = int(dimensions.group(1))
+                parameters["max_height"] = int(dimensions.group(2))
+            image_format = IMAGE_FORMAT.search(prompt)
+            if image_format:
+                parameters["format"] = "JPEG" if image_format.group(1).lower().startswith("jp") else image_format.group(1).upper()
+
+        elif function_name in ("word_to_pdf", "image_to_pdf"):
+            page_size = PAGE_SIZE.search(prompt)
+            if page_size:
+                parameters["page_size"] = page_size.group(1).upper()
+            orientation = ORIENTATION.search(prompt)
+            if orientation:
+                parameters["orientation"] = orientation.group(1).lower()
+            margin = MARGIN_POINTS.search(prompt)
+            if margin:
+                parameters["margin"] = int(margin.group(1))
+            else:
+                margin = MARGIN_INCHES.search(prompt)
+                if margin:
+                    parameters["margin"] = int(float(margin.group(1)) * 72)
+            dpi = DPI.search(prompt)
+            if dpi and function_name == "image_to_pdf":
+                parameters["dpi"] = int(dpi.group(1))
+
+        elif function_name == "replace_text":
+            # Unbalanced quotes (e.g. 'it's') could be split anywhere; leave those to the LLM
+            if STRAY_QUOTE.search(REPLACE_PAIR.sub(' ', prompt)):
+                return None
+            pairs = [
+                (next(group for group in groups[:3] if group), next(group for group in groups[3:] if group))
+                for groups in REPLACE_PAIR.findall(prompt)
+            ]
+            if not pairs:
+                return None
+            lowered = prompt.lower()
+            if len(pairs) == 1:
+                parameters["find_text"], parameters["replace_text"] = pairs[0]
+            else:
+                parameters["replacements"] = [{"find": find, "replace": replace} for find, replace in pairs]
+            parameters["case_sensitive"] = (
+                ("case sensitive" in lowered or "case-sensitive" in lowered or "case-sensitively" in lowered)
+                and "insensitive" not in lowered
+            )
+
+        elif function_name == "speech_to_text":
+            parameters["language"] = self._detect_language(prompt) or "auto"
+            parameters["model"] = "saarika:v2"
+
+        elif function_name == "text_to_speech":
+            if STRAY_QUOTE.search(QUOTED_TEXT.sub(' ', prompt)):
+                return None
+            quoted = QUOTED_TEXT.search(prompt)
+            text = next((group for group in quoted.groups() if group), "") if quoted else ""
+            if not text and not file_paths:
+                return None
+            parameters["text"] = text
+            parameters["language"] = self._detect_language(prompt) or "hindi"
+            parameters["format"] = "mp3" if re.search(r'\bmp3\b', prompt, re.IGNORECASE) else "wav"
+
+        return parameters
+
+    def _detect_language(self, prompt: str) -> Optional[str]:
+        lowered = prompt.lower()
+        for language, keywords in LANGUAGE_KEYWORDS.items():
+            if any(keyword in lowered for keyword in keywords):
+                return language
+        return None
+
+def measure_agreement(corpus_path: str, compare_with_gemini: bool = False) -> Dict[str, Any]:
+    """Run the classifier over a labeled prompt corpus
+
+    Reports how many prompts were routed locally, how often the local decision
+    matched the label, and (optionally) how often it matched a live Gemini call.
+    """
+    import asyncio
+    from app.client.gemini_client import GeminiClient
+
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    client = GeminiClient()
+    classifier = client.intent_classifier or IntentClassifier(client.available_functions)
+
+    routed = correct = gemini_agree = gemini_compared = 0
+    misses = []
+    total_time = 0.0
+
+    for sample in corpus:
+        file_paths = [f"sample{ext}" for ext in sample.get("files", [])]
+        start = time.perf_counter()
+        decision, _ = classifier.classify(sample["prompt"], file_paths)
+        total_time += time.perf_counter() - start
+
+        if decision is None:
+            continue
+        routed += 1
+        if decision.function_name == sample["function"]:
+            correct += 1
+        else:
+            misses.append({"prompt": sample["prompt"], "expected": sample["function"], "got": decision.function_name})
+
+        if compare_with_gemini:
+            gemini_call = asyncio.run(client.parse_prompt_with_llm(sample["prompt"], file_paths))
+            gemini_compared += 1
+            if gemini_call.function_name == decision.function_name:
+                gemini_agree += 1
+
+    return {
+        "samples": len(corpus),
+        "routed_locally": routed,
+        "coverage": round(routed / len(corpus), 3) if corpus else 0.0,
+        "label_accuracy": round(correct / routed, 3) if routed else None,
+        "gemini_agreement": round(gemini_agree / gemini_compared, 3) if gemini_compared else None,
+        "avg_classify_ms": round(total_time / len(corpus) * 1000, 3) if corpus else 0.0,
+        "mismatches": misses
+    }
+
+if __name__ == "__main__":
+    # python -m app.client.intent_classifier [corpus.json] [--gemini]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    default_corpus = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.json")
+    report = measure_agreement(args[0] if args else default_corpus, compare_with_gemini='--gemini' in sys.argv)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
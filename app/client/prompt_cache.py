@@ -0,0 +1,112 @@
+import copy
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from app.config import Config
+
+class PromptCache:
+    """LRU + TTL cache of prompt-to-function decisions
+
+    Keys are the normalized prompt text plus the sorted set of uploaded file
+    extensions. Entries live in process memory; with the 'sqlite' backend they are
+    also written to a SQLite file so every uvicorn worker on the host shares hits.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None,
+                 min_confidence: float = None, backend: str = None, db_path: str = None):
+        self.max_entries = max_entries if max_entries is not None else Config.PROMPT_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Config.PROMPT_CACHE_TTL_SECONDS
+        self.min_confidence = min_confidence if min_confidence is not None else Config.PROMPT_CACHE_MIN_CONFIDENCE
+        self.backend = (backend or Config.PROMPT_CACHE_BACKEND).lower()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.backend == 'sqlite':
+            db_path = db_path or os.path.join(Config.CACHE_DIR, "prompt_cache.sqlite3")
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, confidence REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(prompt: str, file_extensions: List[str]) -> str:
+        """Normalize the prompt and file extension list into a cache key"""
+        normalized = re.sub(r'\s+', ' ', prompt).strip().casefold().rstrip('.!?')
+        extensions = ','.join(sorted(set(ext.lower() for ext in file_extensions)))
+        return f"{normalized}|{extensions}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached decision dict (function_name, parameters, confidence) or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM prompt_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row:
+                    entry = (row[1], json.loads(row[0]))
+                    self._store_local(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: str, decision: Dict[str, Any]) -> bool:
+        """Cache a decision if it is confident enough; returns whether it was stored"""
+        if float(decision.get('confidence', 0.0)) < self.min_confidence:
+            return False
+
+        expires_at = time.time() + self.ttl_seconds
+        entry = (expires_at, copy.deepcopy(decision))
+        with self._lock:
+            self._store_local(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO prompt_cache (key, value, confidence, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(decision, ensure_ascii=False), float(decision['confidence']), expires_at)
+                    )
+                    self._db.execute("DELETE FROM prompt_cache WHERE expires_at <= ?", (time.time(),))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Warning: Could not write prompt cache entry: {e}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def _store_local(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
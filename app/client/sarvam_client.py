@@ -2,7 +2,9 @@ from sarvamai import SarvamAI
 import os
 import asyncio
 import base64
-from typing import Dict, Any, List
+import io
+import time
+from typing import Dict, Any, List, Optional
 from app.config import Config
 
 class SarvamClient:
@@ -31,7 +33,38 @@ class SarvamClient:
         }        # Supported audio formats
         self.supported_audio_formats = ['.wav', '.mp3', '.m4a', '.flac', '.aac']
         self.experimental_formats = ['.webm', '.ogg']  # May work but not officially supported
-    async def speech_to_text(self, audio_file_path: str, language: str = 'auto', model: str = 'saarika:v2') -> Dict[str, Any]:
+        
+        # Languages to try in priority order with their native names
+        self.detection_languages = [
+            ('hindi', 'hi-IN', 'हिंदी'),
+            ('gujarati', 'gu-IN', 'ગુજરાતી'), 
+            ('tamil', 'ta-IN', 'தமிழ்'),
+            ('telugu', 'te-IN', 'తెలుగు'),
+            ('bengali', 'bn-IN', 'বাংলা'),
+            ('marathi', 'mr-IN', 'मराठी'),
+            ('punjabi', 'pa-IN', 'ਪੰਜਾਬੀ'),
+            ('kannada', 'kn-IN', 'ಕನ್ನಡ'),
+            ('malayalam', 'ml-IN', 'മലയാളം'),
+            ('odia', 'or-IN', 'ଓଡ଼ିଆ'),
+            ('assamese', 'as-IN', 'অসমীয়া'),
+            ('english', 'en-IN', 'English')
+        ]
+        # Languages written in each script reported by _detect_script
+        self.script_languages = {
+            "Devanagari (Hindi/Marathi)": ['hi-IN', 'mr-IN'],
+            "Gujarati": ['gu-IN'],
+            "Tamil": ['ta-IN'],
+            "Telugu": ['te-IN'],
+            "Bengali": ['bn-IN', 'as-IN'],
+            "Punjabi": ['pa-IN'],
+            "Kannada": ['kn-IN'],
+            "Malayalam": ['ml-IN'],
+            "Odia": ['or-IN'],
+            "Latin (English)": ['en-IN']
+        }
+        self.auto_detect_stats = {'requests': 0, 'remote_calls': 0, 'candidate_set_sizes': {}}
+    async def speech_to_text(self, audio_file_path: str, language: str = 'auto', model: str = 'saarika:v2',
+                             language_hints: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Convert speech to text using Sarvam AI with automatic language detection
         
@@ -39,6 +72,8 @@ class SarvamClient:
             audio_file_path: Path to the audio file
             language: Language name (e.g., 'hindi', 'gujarati', 'english', 'auto' for detection)
             model: Model to use for transcription
+            language_hints: Likely language codes (e.g. from Accept-Language or the previous
+                request) used to narrow auto-detection
             
         Returns:
             Dictionary with transcription results including detected language in native script
@@ -64,7 +99,7 @@ class SarvamClient:
             # Handle automatic language detection
             if language.lower() == 'auto':
                 print("🔍 Auto-detecting language and transcribing in native script...")
-                return await self._auto_detect_and_transcribe(audio_file_path, model)
+                return await self._auto_detect_and_transcribe(audio_file_path, model, language_hints)
             else:
                 # Use specified language
                 language_code = self.supported_languages.get(language.lower(), 'hi-IN')
@@ -84,69 +119,62 @@ class SarvamClient:
                 'audio_file': audio_file_path
             }
     
-    async def _auto_detect_and_transcribe(self, audio_file_path: str, model: str) -> Dict[str, Any]:
+    async def _auto_detect_and_transcribe(self, audio_file_path: str, model: str,
+                                          language_hints: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Auto-detect language and transcribe in native script
-        """
-        # Languages to try in priority order with their native names
-        detection_languages = [
-            ('hindi', 'hi-IN', 'हिंदी'),
-            ('gujarati', 'gu-IN', 'ગુજરાતી'), 
-            ('tamil', 'ta-IN', 'தமிழ்'),
-            ('telugu', 'te-IN', 'తెలుగు'),
-            ('bengali', 'bn-IN', 'বাংলা'),
-            ('marathi', 'mr-IN', 'मराठी'),
-            ('punjabi', 'pa-IN', 'ਪੰਜਾਬੀ'),
-            ('kannada', 'kn-IN', 'ಕನ್ನಡ'),
-            ('malayalam', 'ml-IN', 'മലയാളം'),
-            ('odia', 'or-IN', 'ଓଡ଼ିଆ'),
-            ('assamese', 'as-IN', 'অসমীয়া'),
-            ('english', 'en-IN', 'English')
-        ]
         
-        best_result = None
-        best_confidence = 0.0
+        A single probe in the service's own auto mode is run first. The script of its
+        transcript (plus any language hints) narrows the candidates to 1-3 languages;
+        if the probe already agrees with its script it is used directly. Otherwise the
+        candidates (or every language, if nothing could be narrowed) are probed
+        concurrently from one in-memory copy of the audio.
+        """
+        with open(audio_file_path, "rb") as audio_file:
+            audio_bytes = audio_file.read()
+        audio_name = os.path.basename(audio_file_path)
         
-        print(f"🔍 Trying {len(detection_languages)} languages for detection...")
+        remote_calls = 0
+        best = None
+        probes = self.detection_languages
+        candidate_count = len(probes)
         
-        for lang_name, lang_code, lang_display in detection_languages:
-            try:
-                print(f"   🧪 Testing {lang_display} ({lang_code})...")
-                
-                with open(audio_file_path, "rb") as audio_file:
-                    response = self.client.speech_to_text.transcribe(
-                        file=audio_file,
-                        model=model,
-                        language_code=lang_code
-                    )
-                
-                # Extract transcription
-                transcribed_text = self._extract_text_from_response(response)
-                
-                # Calculate confidence based on text characteristics
-                confidence = self._calculate_language_confidence(transcribed_text, lang_name, lang_code)
-                
-                print(f"   📝 Result: '{transcribed_text[:50]}...' (confidence: {confidence:.3f})")
-                
-                if confidence > best_confidence and transcribed_text.strip():
-                    best_confidence = confidence
-                    best_result = {
-                        'success': True,
-                        'transcribed_text': transcribed_text,
-                        'text': transcribed_text,
-                        'language': lang_display,
-                        'language_code': lang_code,
-                        'confidence': confidence,
-                        'detected_script': self._detect_script(transcribed_text),
-                        'audio_file': audio_file_path
-                    }
-                    print(f"   ✅ New best result: {lang_display} (confidence: {confidence:.3f})")
-                
-            except Exception as e:
-                print(f"   ❌ Failed for {lang_display}: {str(e)}")
-                continue
+        try:
+            preselected, probe_result, probe_calls = await self._preselect_languages(
+                audio_bytes, audio_name, model, language_hints or []
+            )
+            remote_calls += probe_calls
+            
+            # Accept the probe when it is confident or its script leaves no other candidate
+            if probe_result is not None and (probe_result[4] >= Config.SARVAM_AUTO_DETECT_STOP_CONFIDENCE or not preselected):
+                best = probe_result
+                candidate_count = 1
+                print(f"   ⚡ Pre-detection probe accepted: {best[2]} (confidence: {best[4]:.3f})")
+            else:
+                if preselected:
+                    probes = preselected
+                candidate_count = len(probes)
+                best, probe_calls = await self._probe_languages(audio_bytes, audio_name, model, probes)
+                remote_calls += probe_calls
+                if probe_result is not None and (best is None or probe_result[4] > best[4]):
+                    best = probe_result
+        finally:
+            self._record_auto_detect(candidate_count, remote_calls)
         
-        if best_result:
+        if best:
+            _, lang_code, lang_display, transcribed_text, confidence = best
+            best_result = {
+                'success': True,
+                'transcribed_text': transcribed_text,
+                'text': transcribed_text,
+                'language': lang_display,
+                'language_code': lang_code,
+                'confidence': confidence,
+                'detected_script': self._detect_script(transcribed_text),
+                'audio_file': audio_file_path,
+                'candidate_languages': candidate_count,
+                'remote_calls': remote_calls
+            }
             print(f"🎯 Final detection: {best_result['language']} with confidence {best_result['confidence']:.3f}")
             print(f"📝 Native script transcript: {best_result['transcribed_text']}")
             return best_result
@@ -163,17 +191,152 @@ class SarvamClient:
                 'audio_file': audio_file_path
             }
     
+    async def _preselect_languages(self, audio_bytes: bytes, audio_name: str, model: str, language_hints: List[str]):
+        """
+        Narrow the detection languages before probing them one by one
+        
+        Returns (languages still to probe in priority order, [] if none are left,
+        the probe's own result if its script confirms it, number of remote calls made).
+        Without script evidence the full list is returned with hinted languages first.
+        """
+        by_code = {code: (name, code, display) for name, code, display in self.detection_languages}
+        hinted = [code for code in language_hints if code in by_code]
+        
+        text = ""
+        reported_code = None
+        remote_calls = 0
+        if Config.SARVAM_AUTO_DETECT_PROBE_LANGUAGE:
+            try:
+                remote_calls += 1
+                response = await asyncio.to_thread(
+                    self._transcribe_bytes, audio_bytes, audio_name, model, Config.SARVAM_AUTO_DETECT_PROBE_LANGUAGE
+                )
+                text = self._extract_text_from_response(response)
+                reported_code = getattr(response, 'language_code', None)
+            except Exception as e:
+                print(f"   ❌ Pre-detection probe failed: {str(e)}")
+        
+        script = self._detect_script(text) if text.strip() else None
+        script_codes = self.script_languages.get(script, [])
+        
+        # Order: the language the service reported, then hints, then the rest of the script's languages
+        ordered = []
+        if not script_codes:
+            # Without script evidence hints only reorder; every language stays a fallback
+            for code in [reported_code] + hinted + list(by_code):
+                if code in by_code and code not in ordered:
+                    ordered.append(code)
+            candidates = [by_code[code] for code in ordered]
+        else:
+            # Latin text may be romanised speech in any language, so hints are kept
+            # and at least one language besides English is probed
+            latin = script == "Latin (English)"
+            for code in [reported_code] + hinted + script_codes:
+                if code in by_code and code not in ordered and (latin or code in script_codes):
+                    ordered.append(code)
+            candidates = [by_code[code] for code in ordered[:3]]
+            if latin and all(c[1] in script_codes for c in candidates):
+                fallback = next(code for code in by_code if code not in script_codes)
+                candidates = candidates[:2] + [by_code[fallback]]
+        print(f"   🔎 Pre-detection: script={script or 'none'}, reported={reported_code}, "
+              f"hints={hinted}, candidates={[c[1] for c in candidates] or 'all'}")
+        
+        probe_result = None
+        if script_codes and reported_code in script_codes:
+            name, code, display = by_code[reported_code]
+            confidence = self._calculate_language_confidence(text, name, code)
+            probe_result = (0, code, display, text, confidence)
+            # The probe already covered the reported language
+            candidates = [c for c in candidates if c[1] != reported_code]
+        
+        return candidates, probe_result, remote_calls
+    
+    async def _probe_languages(self, audio_bytes: bytes, audio_name: str, model: str, languages: List[tuple]):
+        """
+        Transcribe with each candidate language concurrently and keep the most confident result
+        
+        At most SARVAM_AUTO_DETECT_CONCURRENCY probes run at once; probing stops early once a
+        result reaches SARVAM_AUTO_DETECT_STOP_CONFIDENCE. Returns (best result or None, remote calls)
+        """
+        semaphore = asyncio.Semaphore(max(1, Config.SARVAM_AUTO_DETECT_CONCURRENCY))
+        stop_confidence = Config.SARVAM_AUTO_DETECT_STOP_CONFIDENCE
+        remote_calls = 0
+        
+        async def probe(priority: int, lang_name: str, lang_code: str, lang_display: str):
+            nonlocal remote_calls
+            async with semaphore:
+                print(f"   🧪 Testing {lang_display} ({lang_code})...")
+                remote_calls += 1
+                response = await asyncio.to_thread(self._transcribe_bytes, audio_bytes, audio_name, model, lang_code)
+                transcribed_text = self._extract_text_from_response(response)
+                
+                # Calculate confidence based on text characteristics
+                confidence = self._calculate_language_confidence(transcribed_text, lang_name, lang_code)
+                print(f"   📝 {lang_display}: '{transcribed_text[:50]}...' (confidence: {confidence:.3f})")
+                return priority, lang_code, lang_display, transcribed_text, confidence
+        
+        best = None
+        
+        print(f"🔍 Trying {len(languages)} languages for detection...")
+        
+        tasks = [
+            asyncio.ensure_future(probe(priority, *language))
+            for priority, language in enumerate(languages)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    priority, lang_code, lang_display, transcribed_text, confidence = await next_done
+                except Exception as e:
+                    print(f"   ❌ Probe failed: {str(e)}")
+                    continue
+                
+                if not transcribed_text.strip():
+                    continue
+                
+                # Highest confidence wins; ties go to the higher-priority language
+                if best is None or (confidence, -priority) > (best[4], -best[0]):
+                    best = (priority, lang_code, lang_display, transcribed_text, confidence)
+                    print(f"   ✅ New best result: {lang_display} (confidence: {confidence:.3f})")
+                
+                if confidence >= stop_confidence:
+                    print(f"   ⏹️ Confidence {confidence:.3f} reached threshold, skipping remaining probes")
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        return best, remote_calls
+    
+    def _record_auto_detect(self, candidate_count: int, remote_calls: int):
+        """Track candidate-set sizes and remote calls per auto-detect request"""
+        stats = self.auto_detect_stats
+        stats['requests'] += 1
+        stats['remote_calls'] += remote_calls
+        sizes = stats['candidate_set_sizes']
+        sizes[candidate_count] = sizes.get(candidate_count, 0) + 1
+    
+    def get_auto_detect_stats(self) -> Dict[str, Any]:
+        """Get auto-detect metrics, including average remote calls per request"""
+        stats = self.auto_detect_stats
+        requests = stats['requests']
+        return {
+            'requests': requests,
+            'remote_calls': stats['remote_calls'],
+            'avg_remote_calls': round(stats['remote_calls'] / requests, 2) if requests else 0.0,
+            'candidate_set_sizes': dict(stats['candidate_set_sizes'])
+        }
+    
     async def _transcribe_with_language(self, audio_file_path: str, language_code: str, model: str, language_name: str) -> Dict[str, Any]:
         """
         Transcribe with a specific language
         """
         try:
             with open(audio_file_path, "rb") as audio_file:
-                response = self.client.speech_to_text.transcribe(
-                    file=audio_file,
-                    model=model,
-                    language_code=language_code
-                )
+                audio_bytes = audio_file.read()
+            response = await asyncio.to_thread(
+                self._transcribe_bytes, audio_bytes, os.path.basename(audio_file_path), model, language_code
+            )
             
             transcribed_text = self._extract_text_from_response(response)
             
@@ -191,6 +354,16 @@ class SarvamClient:
         except Exception as e:
             raise Exception(f"Transcription failed for {language_name}: {str(e)}")
     
+    def _transcribe_bytes(self, audio_bytes: bytes, audio_name: str, model: str, language_code: str):
+        """Blocking Sarvam transcribe call on an in-memory copy of the audio"""
+        audio_file = io.BytesIO(audio_bytes)
+        audio_file.name = audio_name
+        return self.client.speech_to_text.transcribe(
+            file=audio_file,
+            model=model,
+            language_code=language_code
+        )
+    
     def _extract_text_from_response(self, response) -> str:
         """Extract text from Sarvam AI response"""
         if hasattr(response, 'transcript'):
@@ -382,8 +555,9 @@ class SarvamClient:
             Dictionary with translation results
         """
         try:
-            # Use Sarvam AI translation API
-            response = self.client.text.translate(
+            # Use Sarvam AI translation API (blocking SDK call, so run it in a thread)
+            response = await asyncio.to_thread(
+                self.client.text.translate,
                 input=text,
                 source_language_code=source_language,
                 target_language_code=target_language,
@@ -424,6 +598,59 @@ class SarvamClient:
                 'translated_text': text  # Fallback to original text
             }
     
+    async def translate_many(self, texts: List[str], source_language: str, target_language: str,
+                             cache=None) -> Dict[str, Any]:
+        """
+        Translate a batch of strings, using the translation cache where possible
+        
+        Cache misses are deduplicated and translated concurrently, at most
+        TRANSLATION_CONCURRENCY at a time. Only successful translations are cached.
+        
+        Returns:
+            Dictionary with 'translations' (text -> translated text) and batch stats
+        """
+        start_time = time.perf_counter()
+        translations = {}
+        misses = []
+        hits = 0
+        
+        for text in dict.fromkeys(texts):
+            cached = cache.get(source_language, target_language, text) if cache is not None else None
+            if cached is not None:
+                translations[text] = cached
+                hits += 1
+            else:
+                misses.append(text)
+        
+        semaphore = asyncio.Semaphore(max(1, Config.TRANSLATION_CONCURRENCY))
+        
+        async def translate(text: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.translate_text(text, source_language, target_language)
+        
+        results = await asyncio.gather(*(translate(text) for text in misses))
+        
+        fresh = {}
+        for text, result in zip(misses, results):
+            translations[text] = result.get('translated_text') or text
+            if result.get('success'):
+                fresh[text] = translations[text]
+        if cache is not None:
+            cache.put_many(source_language, target_language, fresh)
+        
+        unique_count = hits + len(misses)
+        return {
+            'translations': translations,
+            'stats': {
+                'unique_texts': unique_count,
+                'cache_hits': hits,
+                'remote_calls': len(misses),
+                'failed': len(misses) - len(fresh),
+                'hit_ratio': round(hits / unique_count, 3) if unique_count else 0.0,
+                'latency_ms': round((time.perf_counter() - start_time) * 1000, 1)
+            }
+        }
+    
     def get_language_mapping(self) -> Dict[str, str]:
         """
         Get mapping of Google Translate language codes to Sarvam AI language codes
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Any, Optional
+from app.config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; bundles are still served gzip-compressed
+    brotli = None
+
+# Matches the `const uiTexts = { ... };` block in script.js
+UI_TEXTS_BLOCK = re.compile(r'const\s+uiTexts\s*=\s*\{(.*?)\n\};', re.DOTALL)
+UI_TEXT_ENTRY = re.compile(r"""['"]([\w-]+)['"]\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+
+def extract_ui_texts(script_path: str = None) -> Dict[str, str]:
+    """Read the translatable UI strings (the uiTexts object) out of script.js"""
+    script_path = script_path or os.path.join(Config.BASE_DIR, "app", "static", "script.js")
+    with open(script_path, 'r', encoding='utf-8') as f:
+        block = UI_TEXTS_BLOCK.search(f.read())
+    if not block:
+        return {}
+
+    texts = {}
+    for match in UI_TEXT_ENTRY.finditer(block.group(1)):
+        raw = match.group(2) if match.group(2) is not None else match.group(3)
+        texts[match.group(1)] = re.sub(r'\\(.)', r'\1', raw)
+    return texts
+
+class TranslationBundles:
+    """Precomputed UI translations, one immutable JSON bundle per language
+
+    Bundle URLs contain the content hash, so browsers can cache them forever;
+    the page gets the current URLs through the template context.
+    """
+
+    def __init__(self):
+        self._bundles: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+
+    async def build(self, sarvam_client, cache=None, source_language: str = 'en-IN') -> Dict[str, Any]:
+        """Translate the UI strings into every supported language and publish the bundles
+
+        A language whose translations did not all succeed is left unpublished, so
+        the page keeps using /api/translate for it.
+        """
+        texts = extract_ui_texts()
+        if not texts:
+            return {"published": 0, "skipped": []}
+
+        skipped = []
+        for target_language in sorted(set(sarvam_client.get_supported_languages().values())):
+            if target_language == source_language:
+                continue
+
+            batch = await sarvam_client.translate_many(list(texts.values()), source_language, target_language, cache=cache)
+            if batch['stats']['failed']:
+                skipped.append(target_language)
+                continue
+
+            translations = {key: batch['translations'][text] for key, text in texts.items()}
+            self._publish(target_language, translations)
+
+        print(f"Published {len(self._bundles)} UI translation bundles (skipped: {skipped or 'none'})")
+        return {"published": len(self._bundles), "skipped": skipped}
+
+    def _publish(self, language: str, translations: Dict[str, str]):
+        body = json.dumps(
+            {"language": language, "translations": translations},
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(',', ':')
+        ).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        name = f"{language}.{digest[:12]}.json"
+
+        bundle = {
+            "name": name,
+            "etag": f'"{digest}"',
+            "identity": body,
+            "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+            "br": brotli.compress(body, quality=11) if brotli is not None else None
+        }
+
+        previous = self._bundles.get(language)
+        if previous is not None:
+            self._by_name.pop(previous["name"], None)
+        self._bundles[language] = bundle
+        self._by_name[name] = bundle
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Get a published bundle by its file name"""
+        return self._by_name.get(name)
+
+    def manifest(self) -> Dict[str, str]:
+        """Map each language code to the URL of its current bundle"""
+        return {language: f"/i18n/{bundle['name']}" for language, bundle in self._bundles.items()}
+
+    @staticmethod
+    def pick_encoding(bundle: Dict[str, Any], accept_encoding: str) -> str:
+        """Choose the best encoding the client accepts"""
+        accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or "").split(',')}
+        if bundle["br"] is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return 'identity'
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+from app.config import Config
+
+class TranslationCache:
+    """Translations keyed on (source language, target language, text hash)
+
+    Entries are persisted to a SQLite file and loaded into memory by warm(), so
+    lookups during a request never touch the disk.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.path.join(Config.CACHE_DIR, "translations.sqlite3")
+        self._entries: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "source TEXT NOT NULL, target TEXT NOT NULL, text_hash TEXT NOT NULL, translated TEXT NOT NULL, "
+                "PRIMARY KEY (source, target, text_hash))"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def warm(self) -> int:
+        """Load every stored translation into memory; returns the number loaded"""
+        with self._lock:
+            rows = self._connect().execute("SELECT source, target, text_hash, translated FROM translations").fetchall()
+            for source, target, text_hash, translated in rows:
+                self._entries[(source, target, text_hash)] = translated
+            return len(rows)
+
+    def get(self, source: str, target: str, text: str) -> Optional[str]:
+        translated = self._entries.get((source, target, self.text_hash(text)))
+        if translated is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return translated
+
+    def put_many(self, source: str, target: str, translations: Dict[str, str]):
+        """Store text -> translation pairs for one language pair"""
+        if not translations:
+            return
+        rows = [(source, target, self.text_hash(text), translated) for text, translated in translations.items()]
+        with self._lock:
+            for row in rows:
+                self._entries[row[:3]] = row[3]
+            try:
+                db = self._connect()
+                db.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", rows)
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not persist translations: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -4,6 +4,15 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+def parse_size(value: str) -> int:
+    """Parse a size such as '50MB', '512KB' or '1048576' into bytes"""
+    value = str(value).strip().upper().replace(' ', '')
+    units = {'GB': 1024 ** 3, 'MB': 1024 ** 2, 'KB': 1024, 'B': 1}
+    for suffix, multiplier in units.items():
+        if value.endswith(suffix):
+            return int(float(value[:-len(suffix)]) * multiplier)
+    return int(value)
+
 class Config:
     # Environment Configuration
     GOOGLE_GEMINI_KEY = os.getenv('GOOGLE_GEMINI_KEY', 'your-api-key-here')
@@ -14,15 +23,74 @@ class Config:
     
     # File Upload Settings
     MAX_FILE_SIZE = os.getenv('MAX_FILE_SIZE', '50MB')
+    MAX_FILE_SIZE_BYTES = parse_size(MAX_FILE_SIZE)
+    UPLOAD_CHUNK_SIZE_KB = int(os.getenv('UPLOAD_CHUNK_SIZE_KB', 1024))
+    UPLOAD_SAVE_CONCURRENCY = int(os.getenv('UPLOAD_SAVE_CONCURRENCY', 8))
     ALLOWED_EXTENSIONS = os.getenv('ALLOWED_EXTENSIONS', '.jpg,.jpeg,.png,.bmp,.tiff,.webp,.docx').split(',')
     
     # Function Settings
     DEFAULT_IMAGE_QUALITY = int(os.getenv('DEFAULT_IMAGE_QUALITY', 85))
+    IMAGE_DRAFT_DECODE = os.getenv('IMAGE_DRAFT_DECODE', 'True').lower() == 'true'
     DEFAULT_PAGE_SIZE = os.getenv('DEFAULT_PAGE_SIZE', 'A4')
     DEFAULT_ORIENTATION = os.getenv('DEFAULT_ORIENTATION', 'portrait')
+    # Images larger than this on the page are downsampled (0 keeps the original resolution)
+    IMAGE_PDF_DPI = int(os.getenv('IMAGE_PDF_DPI', 200))
+    
+    # Executor Settings (CPU-heavy functions run in processes, I/O-heavy ones in threads)
+    CPU_WORKERS = int(os.getenv('CPU_WORKERS', os.cpu_count() or 1))
+    CPU_MAX_QUEUE = int(os.getenv('CPU_MAX_QUEUE', 16))
+    IO_WORKERS = int(os.getenv('IO_WORKERS', 8))
+    IO_MAX_QUEUE = int(os.getenv('IO_MAX_QUEUE', 32))
+    IMAGE_COMPRESSION_WORKERS = int(os.getenv('IMAGE_COMPRESSION_WORKERS', CPU_WORKERS))
+    # Image-to-PDF pages prepared in parallel, and the source bytes allowed in flight at once
+    IMAGE_PDF_WORKERS = int(os.getenv('IMAGE_PDF_WORKERS', CPU_WORKERS))
+    IMAGE_PDF_INFLIGHT_MB = int(os.getenv('IMAGE_PDF_INFLIGHT_MB', 128))
+    WORD_TO_PDF_WORKERS = int(os.getenv('WORD_TO_PDF_WORKERS', CPU_WORKERS))
+    
+    # Result Cache Settings
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True').lower() == 'true'
+    RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', 500))
+    
+    # Prompt Cache Settings (backend: 'memory' or 'sqlite' to share across workers)
+    PROMPT_CACHE_ENABLED = os.getenv('PROMPT_CACHE_ENABLED', 'True').lower() == 'true'
+    PROMPT_CACHE_BACKEND = os.getenv('PROMPT_CACHE_BACKEND', 'memory')
+    PROMPT_CACHE_MAX_ENTRIES = int(os.getenv('PROMPT_CACHE_MAX_ENTRIES', 1024))
+    PROMPT_CACHE_TTL_SECONDS = int(os.getenv('PROMPT_CACHE_TTL_SECONDS', 3600))
+    PROMPT_CACHE_MIN_CONFIDENCE = float(os.getenv('PROMPT_CACHE_MIN_CONFIDENCE', 0.8))
+    
+    # Local intent classifier that skips Gemini for unambiguous prompts
+    INTENT_FAST_PATH_ENABLED = os.getenv('INTENT_FAST_PATH_ENABLED', 'True').lower() == 'true'
+    INTENT_FAST_PATH_MIN_CONFIDENCE = float(os.getenv('INTENT_FAST_PATH_MIN_CONFIDENCE', 0.85))
+    
+    # Gemini Call Settings (GEMINI_TIMEOUT_FALLBACK: 'keyword' to fall back, 'error' to fail the request)
+    GEMINI_CALL_TIMEOUT_SECONDS = float(os.getenv('GEMINI_CALL_TIMEOUT_SECONDS', 8))
+    GEMINI_DEADLINE_SECONDS = float(os.getenv('GEMINI_DEADLINE_SECONDS', 15))
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+    GEMINI_BACKOFF_BASE_SECONDS = float(os.getenv('GEMINI_BACKOFF_BASE_SECONDS', 0.5))
+    GEMINI_HEDGE_ENABLED = os.getenv('GEMINI_HEDGE_ENABLED', 'False').lower() == 'true'
+    GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv('GEMINI_HEDGE_MIN_SAMPLES', 20))
+    GEMINI_TIMEOUT_FALLBACK = os.getenv('GEMINI_TIMEOUT_FALLBACK', 'keyword').lower()
+    
+    # Sarvam auto language detection
+    SARVAM_AUTO_DETECT_CONCURRENCY = int(os.getenv('SARVAM_AUTO_DETECT_CONCURRENCY', 4))
+    SARVAM_AUTO_DETECT_STOP_CONFIDENCE = float(os.getenv('SARVAM_AUTO_DETECT_STOP_CONFIDENCE', 0.9))
+    # Language code for the single pre-detection probe ('unknown' lets Sarvam detect it); empty disables the probe
+    SARVAM_AUTO_DETECT_PROBE_LANGUAGE = os.getenv('SARVAM_AUTO_DETECT_PROBE_LANGUAGE', 'unknown')
+    
+    # UI translation cache
+    TRANSLATION_CACHE_ENABLED = os.getenv('TRANSLATION_CACHE_ENABLED', 'True').lower() == 'true'
+    TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', 8))
+    UI_BUNDLES_ENABLED = os.getenv('UI_BUNDLES_ENABLED', 'True').lower() == 'true'
+    
+    # Text replacement (ZIP members are streamed in chunks of this many characters)
+    TEXT_REPLACE_CHUNK_KB = int(os.getenv('TEXT_REPLACE_CHUNK_KB', 1024))
+    TEXT_REPLACE_WORKERS = int(os.getenv('TEXT_REPLACE_WORKERS', CPU_WORKERS))
+    TEXT_REPLACE_INFLIGHT_MB = int(os.getenv('TEXT_REPLACE_INFLIGHT_MB', 64))
       # Cleanup Settings
-    CLEANUP_INTERVAL_HOURS = int(os.getenv('CLEANUP_INTERVAL_HOURS', 24))
+    CLEANUP_INTERVAL_HOURS = float(os.getenv('CLEANUP_INTERVAL_HOURS', 24))
+    CLEANUP_RETENTION_HOURS = float(os.getenv('CLEANUP_RETENTION_HOURS', 24))
       # File paths - using absolute paths for reliability
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     UPLOAD_DIR = os.path.join(BASE_DIR, "app", "file_handler", "uploads")
-    OUTPUT_DIR = os.path.join(BASE_DIR, "app", "file_handler", "outputs")
\ No newline at end of file
+    OUTPUT_DIR = os.path.join(BASE_DIR, "app", "file_handler", "outputs")
+    CACHE_DIR = os.path.join(BASE_DIR, "app", "file_handler", "cache")
\ No newline at end of file
@@ -0,0 +1,210 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from app.config import Config
+
+class ArtifactCatalog:
+    """SQLite catalog of uploaded and generated files with their expiry times
+
+    Every upload, output file and extraction folder is recorded when it is
+    created. Cleanup reads the expired rows through the expires_at index, oldest
+    first, so it never has to walk the upload or output folders.
+    """
+
+    def __init__(self, db_path: str = None, retention_hours: float = None):
+        self.db_path = db_path or os.path.join(Config.CACHE_DIR, "artifacts.sqlite3")
+        self.retention_seconds = (retention_hours if retention_hours is not None else Config.CLEANUP_RETENTION_HOURS) * 3600
+        self.roots = [os.path.abspath(Config.UPLOAD_DIR), os.path.abspath(Config.OUTPUT_DIR)]
+        self._lock = threading.Lock()
+        self.bytes_reclaimed = 0
+        self.entries_deleted = 0
+        self.last_run = None
+        self.last_run_ms = 0.0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        is_new = not os.path.exists(self.db_path)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_expiry ON artifacts (expires_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, artifacts TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        if is_new:
+            self._adopt_existing()
+
+    def register(self, path: str, size: int = None, ttl_seconds: float = None):
+        """Record a file or folder; registering it again pushes its expiry back"""
+        path = os.path.abspath(path)
+        if not self._is_managed(path):
+            return
+        if size is None:
+            size = path_size(path)
+        now = time.time()
+        expires_at = now + (ttl_seconds if ttl_seconds is not None else self.retention_seconds)
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT INTO artifacts (path, size, created_at, expires_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET size = excluded.size, expires_at = excluded.expires_at",
+                    (path, size, now, expires_at)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not catalog {path}: {e}")
+
+    def register_outputs(self, result: Dict[str, Any]) -> List[str]:
+        """Record every output file or folder a function result refers to; returns their names"""
+        names = collect_output_artifacts(result, Config.OUTPUT_DIR)
+        for name in names:
+            self.register(os.path.join(Config.OUTPUT_DIR, name))
+        return names
+
+    def register_job(self, job_id: str, artifacts: List[str]):
+        """Remember which outputs a request produced, for the bundle download"""
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, artifacts, expires_at) VALUES (?, ?, ?)",
+                    (job_id, json.dumps(artifacts), time.time() + self.retention_seconds)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not record job {job_id}: {e}")
+
+    def get_job(self, job_id: str) -> Optional[List[str]]:
+        """Get the output names of an unexpired job"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT artifacts FROM jobs WHERE job_id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge_expired(self, now: float = None, batch_size: int = 500) -> Dict[str, Any]:
+        """Delete expired entries in expiry order; returns what was reclaimed"""
+        return self._purge("expires_at", now if now is not None else time.time(), batch_size)
+
+    def purge_older_than(self, max_age_seconds: float, batch_size: int = 500) -> Dict[str, Any]:
+        """Delete entries created more than max_age_seconds ago, regardless of expiry"""
+        return self._purge("created_at", time.time() - max_age_seconds, batch_size)
+
+    def _purge(self, column: str, cutoff: float, batch_size: int) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        deleted = 0
+        reclaimed = 0
+
+        with self._lock:
+            while True:
+                rows = self._db.execute(
+                    f"SELECT path, size FROM artifacts WHERE {column} <= ? ORDER BY {column} LIMIT ?",
+                    (cutoff, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+
+                for path, size in rows:
+                    try:
+                        if os.path.isdir(path):
+                            shutil.rmtree(path)
+                        elif os.path.exists(path):
+                            os.remove(path)
+                        else:
+                            size = 0  # Already gone (e.g. temporary audio)
+                    except OSError as e:
+                        print(f"Warning: Could not delete expired file {path}: {e}")
+                        continue
+                    deleted += 1
+                    reclaimed += size
+
+                self._db.executemany("DELETE FROM artifacts WHERE path = ?", [(row[0],) for row in rows])
+                self._db.commit()
+                if len(rows) < batch_size:
+                    break
+
+            self._db.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+        self.entries_deleted += deleted
+        self.bytes_reclaimed += reclaimed
+        self.last_run = time.time()
+        self.last_run_ms = round((time.perf_counter() - start_time) * 1000, 1)
+        return {"deleted": deleted, "bytes_reclaimed": reclaimed}
+
+    def stats(self) -> Dict[str, Any]:
+        """Get disk usage and cleanup counters"""
+        with self._lock:
+            entries, tracked_bytes, next_expiry = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(expires_at) FROM artifacts"
+            ).fetchone()
+        disk = shutil.disk_usage(Config.OUTPUT_DIR)
+        return {
+            "tracked_entries": entries,
+            "tracked_bytes": tracked_bytes,
+            "next_expiry": next_expiry,
+            "volume_used_bytes": disk.used,
+            "volume_free_bytes": disk.free,
+            "entries_deleted": self.entries_deleted,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "last_run": self.last_run,
+            "last_run_ms": self.last_run_ms
+        }
+
+    def _is_managed(self, path: str) -> bool:
+        """Only files directly inside the upload or output folders are ever deleted"""
+        return os.path.dirname(path) in self.roots
+
+    def _adopt_existing(self):
+        """Catalog files left over from before the catalog existed (one-time, top level only)"""
+        adopted = 0
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            for entry in os.scandir(root):
+                if entry.name.startswith('.'):
+                    continue
+                modified = entry.stat().st_mtime
+                self._db.execute(
+                    "INSERT OR IGNORE INTO artifacts (path, size, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (entry.path, path_size(entry.path), modified, modified + self.retention_seconds)
+                )
+                adopted += 1
+        self._db.commit()
+        if adopted:
+            print(f"Artifact catalog adopted {adopted} existing files")
+
+def collect_output_artifacts(result: Dict[str, Any], output_dir: str) -> List[str]:
+    """Find the output files and folders a result refers to, relative to the outputs folder"""
+    artifacts = []
+
+    def visit(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+        elif isinstance(value, str) and value:
+            name = os.path.basename(value.rstrip('/\\'))
+            if name not in ('', '.', '..') and name not in artifacts and os.path.exists(os.path.join(output_dir, name)):
+                artifacts.append(name)
+
+    visit(result)
+    return artifacts
+
+def path_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(path)
+            for name in files
+        )
+    return os.path.getsize(path) if os.path.exists(path) else 0
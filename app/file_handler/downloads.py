@@ -0,0 +1,265 @@
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import anyio
+from starlette.responses import Response
+
+# Outputs are written once under a name with a random 8-hex suffix, so they never change
+UUID_TAGGED_NAME = re.compile(r'_[0-9a-f]{8}\.[A-Za-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Types mimetypes does not know on every platform
+EXTRA_MEDIA_TYPES = {
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.webp': 'image/webp',
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.m4a': 'audio/mp4',
+    '.flac': 'audio/flac',
+    '.aac': 'audio/aac',
+    '.ogg': 'audio/ogg',
+    '.md': 'text/markdown'
+}
+
+# Already-compressed formats are stored as-is in bundles; deflating them only burns CPU
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.webp', '.gif', '.pdf', '.mp3', '.m4a', '.aac', '.ogg', '.flac',
+    '.zip', '.docx', '.xlsx', '.pptx', '.gz'
+}
+BUNDLE_CHUNK_SIZE = 256 * 1024
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header asks for bytes outside the file"""
+    pass
+
+class ETagCache:
+    """SHA-256 ETags of output files, keyed on path, size and modification time"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> str:
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            etag = self._entries.get(key)
+            if etag is not None:
+                self._entries.move_to_end(key)
+                return etag
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()}"'
+
+        with self._lock:
+            self._entries[key] = etag
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+etag_cache = ETagCache()
+
+def media_type_for(path: str) -> str:
+    """Get the media type for a file name, defaulting to application/octet-stream"""
+    extension = os.path.splitext(path)[1].lower()
+    return EXTRA_MEDIA_TYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single 'bytes=' range into inclusive (start, end) offsets
+
+    Returns None when the header should be ignored (other units, several ranges
+    or malformed values), in which case the whole file is sent.
+    """
+    if not range_header or not range_header.strip().lower().startswith('bytes='):
+        return None
+    spec = range_header.strip()[6:]
+    if ',' in spec:
+        return None
+
+    start_text, _, end_text = spec.strip().partition('-')
+    try:
+        if start_text == '':
+            suffix = int(end_text)
+            if suffix == 0:
+                raise RangeNotSatisfiable(range_header)
+            return max(0, size - suffix), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable(range_header)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+def is_not_modified(request_headers, etag: str, last_modified: float) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since when it is absent"""
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+
+    if_modified_since = request_headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class FileRangeResponse(Response):
+    """
+    Send a file, or one byte range of it, without loading it into memory
+
+    Uses the ASGI zero-copy extension (sendfile) when the server offers it,
+    otherwise streams the file in chunks read off the event loop.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, start: int, end: int, status_code: int = 200,
+                 headers: Dict[str, str] = None, media_type: str = None):
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.length <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, 'rb') as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False
+                })
+                return
+
+            f.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(f.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+async def file_download_response(path: str, request_headers) -> Response:
+    """Build a conditional, range-aware download response for an output file"""
+    stat = await anyio.to_thread.run_sync(os.stat, path)
+    etag = await anyio.to_thread.run_sync(etag_cache.get, path, stat)
+    filename = os.path.basename(path)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if UUID_TAGGED_NAME.search(filename) else REVALIDATE_CACHE_CONTROL
+    }
+
+    if is_not_modified(request_headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    size = stat.st_size
+
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if_range = request_headers.get('if-range')
+    byte_range = None
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request_headers.get('range'), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type_for(path))
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return FileRangeResponse(path, start, end, 206, headers, media_type_for(path))
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable stream that collects what ZipFile writes until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def bundle_entries(output_dir: str, artifacts: List[str]) -> List[Tuple[str, str]]:
+    """Expand output files and folders into (archive name, path) pairs"""
+    entries = []
+    for name in artifacts:
+        path = os.path.join(output_dir, os.path.basename(name))
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file in sorted(files):
+                    file_path = os.path.join(root, file)
+                    entries.append((os.path.relpath(file_path, output_dir).replace(os.sep, '/'), file_path))
+        elif os.path.isfile(path):
+            entries.append((name, path))
+    return entries
+
+def iter_zip(entries: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Build a ZIP of the given files on the fly
+
+    The archive is written to a non-seekable sink, so ZipFile uses data
+    descriptors and nothing is staged on disk; at most one chunk of each
+    member is held in memory at a time.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            stored = os.path.splitext(path)[1].lower() in STORED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(path, 'rb') as src, archive.open(info, 'w', force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as dst:
+                for chunk in iter(lambda: src.read(BUNDLE_CHUNK_SIZE), b''):
+                    dst.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
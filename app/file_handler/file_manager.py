@@ -1,49 +1,91 @@
 import aiofiles
+import asyncio
+import hashlib
 import os
 import uuid
 from fastapi import UploadFile
-from typing import List
+from typing import List, Dict, Any
 from app.config import Config
+from app.file_handler.artifact_catalog import ArtifactCatalog
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_FILE_SIZE"""
+    pass
 
 class FileManager:
     def __init__(self):
         self.upload_dir = Config.UPLOAD_DIR
         self.output_dir = Config.OUTPUT_DIR
+        self.max_file_size = Config.MAX_FILE_SIZE_BYTES
+        self.chunk_size = max(1, Config.UPLOAD_CHUNK_SIZE_KB) * 1024
         
         # Create directories if they don't exist
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
+        
+        # Expiry catalog of everything written to the upload and output folders
+        self.catalog = ArtifactCatalog()
     
     async def save_upload(self, file: UploadFile) -> str:
         """Save uploaded file and return the file path"""
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(self.upload_dir, unique_filename)
+        saved = await self.stream_upload(file)
+        return saved["path"]
+    
+    async def stream_upload(self, file: UploadFile, file_path: str = None) -> Dict[str, Any]:
+        """
+        Stream an upload to disk in fixed-size chunks
         
-        # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        The SHA-256 and size are computed while writing, so the whole file is never
+        held in memory. The partial file is removed and UploadTooLargeError raised as
+        soon as the upload grows past MAX_FILE_SIZE.
         
-        return file_path
+        Returns:
+            Dictionary with 'path', 'size' and 'sha256'
+        """
+        if file_path is None:
+            # Generate unique filename
+            file_extension = os.path.splitext(file.filename)[1]
+            unique_filename = f"{uuid.uuid4()}{file_extension}"
+            file_path = os.path.join(self.upload_dir, unique_filename)
+        
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_file_size:
+                        raise UploadTooLargeError(
+                            f"{file.filename} exceeds the maximum upload size of {Config.MAX_FILE_SIZE}"
+                        )
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        
+        # Cataloguing commits to SQLite, so keep it off the event loop
+        await asyncio.to_thread(self.catalog.register, file_path, size)
+        return {"path": file_path, "size": size, "sha256": digest.hexdigest()}
     
     def get_output_path(self, filename: str) -> str:
         """Get path for output file"""
         return os.path.join(self.output_dir, filename)
     
-    def cleanup_old_files(self, max_age_hours: int = 24):
-        """Clean up old files to save disk space"""
-        import time
-        current_time = time.time()
-        
-        for directory in [self.upload_dir, self.output_dir]:
-            for filename in os.listdir(directory):
-                file_path = os.path.join(directory, filename)
-                if os.path.isfile(file_path):
-                    file_age = current_time - os.path.getctime(file_path)
-                    if file_age > max_age_hours * 3600:
-                        os.remove(file_path)
+    def cleanup_old_files(self, max_age_hours: int = None) -> dict:
+        """
+        Clean up old files to save disk space
+        
+        Without max_age_hours, removes catalogued files whose expiry has passed;
+        otherwise removes everything created more than max_age_hours ago.
+        """
+        if max_age_hours is None:
+            return self.catalog.purge_expired()
+        return self.catalog.purge_older_than(max_age_hours * 3600)
     
     def get_file_info(self, file_path: str) -> dict:
         """Get information about a file"""
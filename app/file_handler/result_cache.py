@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from app.config import Config
+from app.file_handler.artifact_catalog import collect_output_artifacts, path_size
+
+# Per-item error reports written next to the outputs (e.g. by ImageCompressor)
+ERROR_ARTIFACT = re.compile(r'_error_[0-9a-f]{8}\.txt$')
+
+class ResultCache:
+    """Content-addressed cache of function results stored in the outputs folder
+
+    Entries are keyed on the SHA-256 of every uploaded file, the function name and
+    the canonicalized parameters. Each entry remembers the result dict and the output
+    files it points at; when the total size of those files exceeds the budget the
+    least recently used entries are evicted and their files deleted.
+
+    Lookups are served from memory. The index is persisted in SQLite one row per
+    entry, so a put or eviction writes only the rows it changes.
+    """
+
+    def __init__(self, max_bytes: int = None, db_path: str = None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.RESULT_CACHE_MAX_MB * 1024 * 1024
+        self.db_path = db_path or os.path.join(Config.CACHE_DIR, "result_cache.sqlite3")
+        self.output_dir = Config.OUTPUT_DIR
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, artifacts TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._load_index()
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Get the SHA-256 hex digest of a file"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(function_name: str, parameters: Dict[str, Any], file_hashes: List[str], file_paths: List[str]) -> str:
+        """Build the cache key for a function call on the given files
+
+        File extensions are part of the key because functions filter inputs by extension.
+        """
+        files = [
+            f"{file_hash}{os.path.splitext(path)[1].lower()}"
+            for file_hash, path in zip(file_hashes, file_paths)
+        ]
+        canonical = json.dumps(
+            {
+                "function": function_name,
+                "parameters": _canonicalize(parameters),
+                "files": files
+            },
+            sort_keys=True,
+            separators=(',', ':'),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result, or None if missing or its outputs are gone"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not all(os.path.exists(os.path.join(self.output_dir, name)) for name in entry['artifacts']):
+                # Outputs were cleaned up behind our back
+                self._remove_entry(key, delete_files=False)
+                self._commit()
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['result']
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Cache a function result and evict old entries beyond the size budget"""
+        try:
+            result = json.loads(json.dumps(result))
+        except (TypeError, ValueError):
+            return  # Not JSON-serializable, so not cacheable
+
+        artifacts = self._collect_artifacts(result)
+        if not artifacts or not _is_complete(result, artifacts):
+            return
+        size = sum(path_size(os.path.join(self.output_dir, name)) for name in artifacts)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove_entry(key, delete_files=False)
+            self._entries[key] = {"result": result, "artifacts": artifacts, "size": size}
+            self._total_bytes += size
+            self._execute(
+                "INSERT OR REPLACE INTO results (key, result, artifacts, size, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), json.dumps(artifacts), size, time.time())
+            )
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest_key = next(iter(self._entries))
+                self._remove_entry(oldest_key, delete_files=True)
+                self.evictions += 1
+
+            self._commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def _collect_artifacts(self, result: Dict[str, Any]) -> List[str]:
+        """Find the output files and folders a result refers to, relative to the outputs folder"""
+        return collect_output_artifacts(result, self.output_dir)
+
+    def _remove_entry(self, key: str, delete_files: bool):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry['size']
+        self._execute("DELETE FROM results WHERE key = ?", (key,))
+        if not delete_files:
+            return
+
+        still_used = {name for other in self._entries.values() for name in other['artifacts']}
+        for name in entry['artifacts']:
+            if name in still_used:
+                continue
+            path = os.path.join(self.output_dir, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"Warning: Could not evict cached output {path}: {e}")
+
+    def _load_index(self):
+        try:
+            rows = self._db.execute(
+                "SELECT key, result, artifacts, size FROM results ORDER BY stored_at"
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: Ignoring unreadable result cache index: {e}")
+            return
+
+        for key, result, artifacts, size in rows:
+            self._entries[key] = {"result": json.loads(result), "artifacts": json.loads(artifacts), "size": size}
+            self._total_bytes += size
+
+    def _execute(self, sql: str, params: tuple):
+        try:
+            self._db.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not update result cache index: {e}")
+
+    def _commit(self):
+        try:
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not save result cache index: {e}")
+
+def _is_complete(result: Dict[str, Any], artifacts: List[str]) -> bool:
+    """Whether every item of a result succeeded
+
+    Partial failures are often transient (a worker killed for memory), so
+    replaying them to later identical requests would repeat the failure.
+    """
+    if result.get('success') is False or result.get('failed_files'):
+        return False
+    return not any(ERROR_ARTIFACT.search(name) for name in artifacts)
+
+def _canonicalize(value: Any) -> Any:
+    """Normalize parameters so equivalent calls produce the same key"""
+    if isinstance(value, dict):
+        return {str(k).strip().lower(): _canonicalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(v) for v in value]
+    if isinstance(value, str):
+        stripped = value.strip()
+        # LLMs return numbers as strings or numbers interchangeably
+        try:
+            number = float(stripped)
+            return int(number) if number.is_integer() else number
+        except ValueError:
+            return stripped
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Callable, Optional
+from app.config import Config
+
+# Execution modes a function can declare through its `execution_mode` attribute
+CPU_BOUND = 'cpu'      # run the whole execute() in the process pool
+IO_BOUND = 'io'        # run the whole execute() in the thread pool
+ASYNC = 'async'        # await execute() on the event loop; it offloads its own work
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when a pool already has its maximum number of queued jobs"""
+
+class BoundedExecutor:
+    """Process or thread pool with a concurrency cap and a bounded wait queue"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, use_processes: bool):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.use_processes = use_processes
+        self._pool: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.use_processes:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def check_capacity(self):
+        """Raise ExecutorBusyError if the pool already has its maximum number of queued jobs"""
+        if self._pending >= self.max_workers + self.max_queue:
+            raise ExecutorBusyError(f"{self.name} pool is busy ({self._pending} jobs pending), try again later")
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in the pool without blocking the event loop"""
+        self.check_capacity()
+        return await self._run(fn, *args, **kwargs)
+
+    async def run_subtask(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run one piece of a job that was already admitted (see check_capacity)
+
+        Waits for a free worker instead of raising ExecutorBusyError, so a job
+        that fans out more pieces than the queue holds cannot reject itself.
+        """
+        return await self._run(fn, *args, **kwargs)
+
+    async def _run(self, fn: Callable, *args, **kwargs) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                pool = self._get_pool()
+                try:
+                    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM kill) and every job in that pool failed with it;
+                    # the first of them replaces the pool, later ones must not discard the new one
+                    if self._pool is pool:
+                        self._reset_pool()
+                    raise
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending
+        }
+
+    def _reset_pool(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+class OrderedPipeline:
+    """Feed work to a pool from a plain thread and consume the results in input order
+
+    Items are either submitted (submit(*args) must return a concurrent Future, e.g.
+    from asyncio.run_coroutine_threadsafe) or added as local items that need no pool
+    work. consume(item, result) is called for every item in the order it was added,
+    with None as the result of a local item. Submitting blocks on the oldest item
+    while `max_in_flight` submissions or `max_bytes` of their declared size are
+    outstanding, so memory stays bounded however long the input is. Leaving the
+    with block cancels whatever is still queued.
+    """
+
+    def __init__(self, submit: Callable[..., Future], consume: Callable[[Any, Any], None],
+                 max_in_flight: int, max_bytes: int):
+        self._submit = submit
+        self._consume = consume
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_bytes = max_bytes
+        self._pending = deque()  # (item, future or None, size) in input order
+        self._in_flight = 0
+        self._in_flight_bytes = 0
+        self.submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for _, future, _ in self._pending:
+            if future is not None:
+                future.cancel()
+        self._pending.clear()
+
+    def submit(self, item: Any, size: int, *args):
+        """Start pool work for item once it fits the limits"""
+        while self._pending and (self._in_flight >= self.max_in_flight or self._in_flight_bytes + size > self.max_bytes):
+            self._consume_next()
+        self._pending.append((item, self._submit(*args), size))
+        self._in_flight += 1
+        self._in_flight_bytes += size
+        self.submitted += 1
+        self._consume_ready()
+
+    def add(self, item: Any):
+        """Queue an item that is consumed without pool work, after everything before it"""
+        self._pending.append((item, None, 0))
+        self._consume_ready()
+
+    def finish(self):
+        """Wait for and consume every remaining item"""
+        while self._pending:
+            self._consume_next()
+
+    def _consume_ready(self):
+        # Never wait on the pool here; the caller goes on reading its input
+        while self._pending and (self._pending[0][1] is None or self._pending[0][1].done()):
+            self._consume_next()
+
+    def _consume_next(self):
+        item, future, size = self._pending.popleft()
+        if future is None:
+            self._consume(item, None)
+            return
+        try:
+            result = future.result()
+        finally:
+            self._in_flight -= 1
+            self._in_flight_bytes -= size
+        self._consume(item, result)
+
+cpu_executor = BoundedExecutor('cpu', Config.CPU_WORKERS, Config.CPU_MAX_QUEUE, use_processes=True)
+io_executor = BoundedExecutor('io', Config.IO_WORKERS, Config.IO_MAX_QUEUE, use_processes=False)
+
+# Function instances created inside pool worker processes, reused across jobs
+_worker_instances: Dict[type, Any] = {}
+
+def _execute_in_process(function_cls: type, parameters: Dict[str, Any], file_paths: List[str]) -> Dict[str, Any]:
+    """Entry point for CPU-bound functions inside a worker process"""
+    instance = _worker_instances.get(function_cls)
+    if instance is None:
+        instance = _worker_instances[function_cls] = function_cls()
+    return asyncio.run(instance.execute(parameters, file_paths))
+
+def _execute_in_thread(instance: Any, parameters: Dict[str, Any], file_paths: List[str]) -> Dict[str, Any]:
+    """Entry point for I/O-bound functions inside a worker thread"""
+    return asyncio.run(instance.execute(parameters, file_paths))
+
+async def run_function(instance: Any, parameters: Dict[str, Any], file_paths: List[str]) -> Dict[str, Any]:
+    """Run a function's execute() according to its declared execution mode"""
+    mode = getattr(instance, 'execution_mode', CPU_BOUND)
+
+    if mode == CPU_BOUND:
+        return await cpu_executor.run(_execute_in_process, type(instance), parameters, file_paths)
+    if mode == IO_BOUND:
+        return await io_executor.run(_execute_in_thread, instance, parameters, file_paths)
+    return await instance.execute(parameters, file_paths)
+
+def get_executor_stats() -> Dict[str, Any]:
+    """Get queue and concurrency information for both pools"""
+    return {
+        "cpu": cpu_executor.stats(),
+        "io": io_executor.stats()
+    }
+
+def shutdown_executors():
+    """Stop the worker pools, waiting for running jobs to finish"""
+    cpu_executor.shutdown()
+    io_executor.shutdown()
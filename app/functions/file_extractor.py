@@ -4,10 +4,13 @@ import shutil
 import uuid
 from typing import Dict, Any, List
 from app.config import Config
+from app.functions.executor import IO_BOUND
 
 class FileExtractor:
     """Extract files from ZIP archives"""
     
+    execution_mode = IO_BOUND
+    
     async def execute(self, parameters: Dict[str, Any], file_paths: List[str]) -> Dict[str, Any]:
         """Execute the file extraction function"""
         if not file_paths:
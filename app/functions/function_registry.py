@@ -6,6 +6,7 @@ from app.functions.file_extractor import FileExtractor
 from app.functions.text_replacer import TextReplacer
 from app.functions.speech_to_text import SpeechToTextConverter
 from app.functions.text_to_speech import TextToSpeechConverter
+from app.functions.executor import run_function, get_executor_stats
 
 class FunctionRegistry:
     def __init__(self):
@@ -25,8 +26,12 @@ class FunctionRegistry:
             raise ValueError(f"Function '{function_name}' not found")
         
         function_instance = self.functions[function_name]
-        return await function_instance.execute(parameters, file_paths)
+        return await run_function(function_instance, parameters, file_paths)
     
     def get_available_functions(self) -> List[str]:
         """Get list of available function names"""
         return list(self.functions.keys())
+    
+    def get_executor_stats(self) -> Dict[str, Any]:
+        """Get worker pool usage for the function executors"""
+        return get_executor_stats()
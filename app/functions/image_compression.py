@@ -1,10 +1,99 @@
 ﻿from PIL import Image
+import asyncio
+import io
+import math
 import os
+import time
 import uuid
-from typing import Dict, Any, List
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from app.config import Config
+from app.functions.executor import ASYNC, cpu_executor
+
+# DCT scaling in the JPEG decoder is anti-aliased, so decoding down to the target itself is safe
+DRAFT_SCALE_GAP = 1.0
+# Box-reduce to at least this multiple of the target size before the final LANCZOS pass
+RESIZE_REDUCING_GAP = 2.0
+# Lowest quality the target-size search will go to before shrinking dimensions
+MIN_TARGET_QUALITY = 5
+
+def draft_to_fit(img: Image.Image, max_width: float, max_height: float) -> bool:
+    """Let the JPEG decoder scale a large image down while decoding.
+    
+    Must be called before the pixel data is loaded. The decoder picks the smallest
+    1/2, 1/4 or 1/8 scale that still covers the fit-inside target, so the final
+    high-quality resize never has to upscale. Returns True if the decode size changed.
+    """
+    if img.format != 'JPEG':
+        return False
+    
+    width, height = img.size
+    ratio = min(max_width / width, max_height / height)
+    if ratio >= 1:
+        return False
+    
+    requested_size = (
+        max(1, int(width * ratio * DRAFT_SCALE_GAP)),
+        max(1, int(height * ratio * DRAFT_SCALE_GAP))
+    )
+    img.draft(None, requested_size)
+    return img.size != (width, height)
+
+def encode_to_target_size(img: Image.Image, save: Callable[[Image.Image, Any, int], None], max_quality: int,
+                          target_bytes: int) -> Tuple[Image.Image, bytes, int, int, bool]:
+    """Find the highest quality whose encoding fits within target_bytes
+    
+    save(img, file_object, quality) encodes the image. Encodes go to memory and are
+    cached per quality, so a search costs about log2(quality range) encodes. If even
+    MIN_TARGET_QUALITY is too big, the image is shrunk once by the estimated area
+    ratio and searched again.
+    
+    Returns (image, encoded bytes, quality, number of encodes, whether the target was met)
+    """
+    encode_count = 0
+    
+    for attempt in range(2):
+        encodings = {}
+        
+        def encode(quality: int) -> bytes:
+            nonlocal encode_count
+            if quality not in encodings:
+                buffer = io.BytesIO()
+                save(img, buffer, quality)
+                encodings[quality] = buffer.getvalue()
+                encode_count += 1
+            return encodings[quality]
+        
+        # Most images already fit at the requested quality
+        if len(encode(max_quality)) <= target_bytes:
+            return img, encodings[max_quality], max_quality, encode_count, True
+        
+        low, high = MIN_TARGET_QUALITY, max_quality - 1
+        best_quality = None
+        while low <= high:
+            mid = (low + high) // 2
+            if len(encode(mid)) <= target_bytes:
+                best_quality = mid
+                low = mid + 1
+            else:
+                high = mid - 1
+        
+        if best_quality is not None:
+            return img, encodings[best_quality], best_quality, encode_count, True
+        
+        smallest = encode(MIN_TARGET_QUALITY)
+        if attempt == 0:
+            # Encoded size scales roughly with pixel count
+            scale = math.sqrt(target_bytes / len(smallest)) * 0.95
+            new_size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+            img = img.resize(new_size, Image.Resampling.LANCZOS)
+    
+    return img, smallest, MIN_TARGET_QUALITY, encode_count, False
 
 class ImageCompressor:
+    # Orchestrates on the event loop; each image is compressed in the process pool
+    execution_mode = ASYNC
+    
     def __init__(self):
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
     
@@ -18,86 +107,157 @@ class ImageCompressor:
         max_width = parameters.get('max_width', 1600)
         max_height = parameters.get('max_height', 1200)
         output_format = parameters.get('format', 'AUTO').upper()
+        workers = parameters.get('workers', Config.IMAGE_COMPRESSION_WORKERS)
+        draft_decode = parameters.get('draft_decode', Config.IMAGE_DRAFT_DECODE)
+        target_size_kb = parameters.get('target_size_kb')
         
         quality = max(25, min(85, int(quality)))
+        workers = max(1, min(int(workers), cpu_executor.max_workers))
+        
+        settings = {
+            'quality': quality,
+            'max_width': max_width,
+            'max_height': max_height,
+            'format': output_format,
+            'draft_decode': bool(draft_decode),
+            'target_bytes': int(float(target_size_kb) * 1024) if target_size_kb else None
+        }
+        image_paths = [path for path in file_paths if self._is_image_file(path)]
+        
+        # Refuse a busy pool before any output is written; accepted images queue for a worker
+        cpu_executor.check_capacity()
+        
+        # Compress images in parallel, at most `workers` in flight; gather keeps input order
+        batch_start = time.perf_counter()
+        semaphore = asyncio.Semaphore(workers)
+        
+        async def compress(file_path: str) -> Dict[str, Any]:
+            async with semaphore:
+                # A dead worker (e.g. OOM kill) breaks the shared pool and fails every image in
+                # flight, this request's and others', not just the one it was compressing. The
+                # pool is then replaced, so each affected image gets one more try on the new one
+                for attempt in range(2):
+                    try:
+                        return await cpu_executor.run_subtask(_compress_file_worker, file_path, settings)
+                    except BrokenProcessPool as e:
+                        if attempt:
+                            return self._write_error(file_path, e)
+        
+        outcomes = await asyncio.gather(*(compress(path) for path in image_paths))
+        batch_time = time.perf_counter() - batch_start
         
-        compressed_files = []
-        compression_results = []
+        compressed_files = [outcome['output_path'] for outcome in outcomes]
+        compression_results = [outcome['result'] for outcome in outcomes if outcome['result']]
         
-        for file_path in file_paths:
-            if not self._is_image_file(file_path):
-                continue
+        if not compressed_files:
+            raise ValueError("No valid image files were processed")
+        
+        return {
+            'message': f"Successfully compressed {len(compression_results)} image(s)",
+            'output_path': compressed_files[0] if len(compressed_files) == 1 else None,
+            'compressed_files': compressed_files,
+            'results': compression_results,
+            'batch_stats': {
+                'workers': workers,
+                'images': len(image_paths),
+                'total_time': f"{batch_time:.3f}s",
+                'images_per_second': round(len(image_paths) / batch_time, 2) if batch_time > 0 else None
+            }
+        }
+    
+    def compress_file(self, file_path: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Compress a single image; returns its output path and result entry (None on error)"""
+        quality = settings['quality']
+        max_width = settings['max_width']
+        max_height = settings['max_height']
+        output_format = settings['format']
+        draft_decode = settings.get('draft_decode', Config.IMAGE_DRAFT_DECODE)
+        target_bytes = settings.get('target_bytes')
+        
+        start_time = time.perf_counter()
+        try:
+            original_size = os.path.getsize(file_path)
             
-            try:
-                original_size = os.path.getsize(file_path)
+            with Image.open(file_path) as img:
+                original_width, original_height = img.size
                 
-                with Image.open(file_path) as img:
-                    original_width, original_height = img.size
-                    
-                    if original_width > max_width or original_height > max_height:
-                        img = self._resize_image(img, max_width, max_height)
-                    
-                    if output_format == 'AUTO':
-                        if img.mode == 'RGBA' or 'transparency' in img.info:
-                            best_format = 'PNG'
-                        else:
-                            best_format = 'JPEG'
+                if original_width > max_width or original_height > max_height:
+                    if draft_decode:
+                        draft_to_fit(img, max_width, max_height)
+                    img = self._resize_image(img, max_width, max_height,
+                                             RESIZE_REDUCING_GAP if draft_decode else None)
+                
+                if output_format == 'AUTO':
+                    if img.mode == 'RGBA' or 'transparency' in img.info:
+                        best_format = 'PNG'
                     else:
-                        best_format = output_format
-                    
-                    if best_format == 'JPEG' and img.mode in ('RGBA', 'P', 'LA'):
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        if img.mode in ('RGBA', 'LA'):
-                            background.paste(img, mask=img.split()[-1])
-                        img = background
-                    
-                    original_name = os.path.splitext(os.path.basename(file_path))[0]
-                    output_filename = f"{original_name}_compressed_{uuid.uuid4().hex[:8]}.{best_format.lower()}"
-                    output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
-                    
-                    if best_format == 'JPEG':
-                        img.save(output_path, format='JPEG', quality=quality, optimize=True)
-                    elif best_format == 'PNG':
-                        img.save(output_path, format='PNG', optimize=True, compress_level=9)
-                    elif best_format == 'WEBP':
-                        img.save(output_path, format='WEBP', quality=quality, optimize=True)
-                    
-                    compressed_size = os.path.getsize(output_path)
-                    compression_ratio = ((original_size - compressed_size) / original_size) * 100
+                        best_format = 'JPEG'
+                else:
+                    best_format = output_format
+                
+                if best_format == 'JPEG' and img.mode in ('RGBA', 'P', 'LA'):
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    if img.mode == 'P':
+                        img = img.convert('RGBA')
+                    if img.mode in ('RGBA', 'LA'):
+                        background.paste(img, mask=img.split()[-1])
+                    img = background
+                
+                original_name = os.path.splitext(os.path.basename(file_path))[0]
+                output_filename = f"{original_name}_compressed_{uuid.uuid4().hex[:8]}.{best_format.lower()}"
+                output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
+                
+                quality_used = quality
+                target_met = None
+                if target_bytes and best_format in ('JPEG', 'WEBP'):
+                    # Search quality in memory and write only the winning encoding
+                    def save(image: Image.Image, target, image_quality: int):
+                        image.save(target, format=best_format, quality=image_quality, optimize=True)
                     
-                    compressed_files.append(output_path)
-                    compression_results.append({
+                    img, encoded, quality_used, _, target_met = encode_to_target_size(img, save, quality, target_bytes)
+                    with open(output_path, 'wb') as f:
+                        f.write(encoded)
+                elif best_format == 'JPEG':
+                    img.save(output_path, format='JPEG', quality=quality, optimize=True)
+                elif best_format == 'PNG':
+                    img.save(output_path, format='PNG', optimize=True, compress_level=9)
+                elif best_format == 'WEBP':
+                    img.save(output_path, format='WEBP', quality=quality, optimize=True)
+                
+                compressed_size = os.path.getsize(output_path)
+                compression_ratio = ((original_size - compressed_size) / original_size) * 100
+                
+                return {
+                    'output_path': output_path,
+                    'result': {
                         'original_file': os.path.basename(file_path),
                         'compressed_file': output_filename,
                         'original_size': self._format_size(original_size),
                         'compressed_size': self._format_size(compressed_size),
                         'compression_ratio': f"{compression_ratio:.1f}%",
-                        'format': best_format
-                    })
-                    
-            except Exception as e:
-                original_name = os.path.splitext(os.path.basename(file_path))[0]
-                error_filename = f"{original_name}_error_{uuid.uuid4().hex[:8]}.txt"
-                error_path = os.path.join(Config.OUTPUT_DIR, error_filename)
+                        'format': best_format,
+                        'quality_used': quality_used,
+                        'target_met': target_met,
+                        'processing_time': f"{time.perf_counter() - start_time:.3f}s"
+                    }
+                }
                 
-                with open(error_path, 'w') as error_file:
-                    error_file.write(f"Error compressing {file_path}: {str(e)}")
-                
-                compressed_files.append(error_path)
+        except Exception as e:
+            return self._write_error(file_path, e)
+    
+    def _write_error(self, file_path: str, error: Exception) -> Dict[str, Any]:
+        """Record why an image could not be compressed in an error file next to the outputs"""
+        original_name = os.path.splitext(os.path.basename(file_path))[0]
+        error_filename = f"{original_name}_error_{uuid.uuid4().hex[:8]}.txt"
+        error_path = os.path.join(Config.OUTPUT_DIR, error_filename)
         
-        if not compressed_files:
-            raise ValueError("No valid image files were processed")
+        with open(error_path, 'w') as error_file:
+            error_file.write(f"Error compressing {file_path}: {str(error)}")
         
-        return {
-            'message': f"Successfully compressed {len(compression_results)} image(s)",
-            'output_path': compressed_files[0] if len(compressed_files) == 1 else None,
-            'compressed_files': compressed_files,
-            'results': compression_results
-        }
+        return {'output_path': error_path, 'result': None}
     
-    def _resize_image(self, img: Image.Image, max_width: float, max_height: float) -> Image.Image:
+    def _resize_image(self, img: Image.Image, max_width: float, max_height: float,
+                      reducing_gap: Optional[float] = None) -> Image.Image:
         current_width, current_height = img.size
         max_width = int(max_width)
         max_height = int(max_height)
@@ -109,7 +269,8 @@ class ImageCompressor:
         if scale_factor < 1:
             new_width = max(int(current_width * scale_factor), 200)
             new_height = max(int(current_height * scale_factor), 200)
-            return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            # reducing_gap lets Pillow box-reduce by an integer factor before LANCZOS
+            return img.resize((new_width, new_height), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
         
         return img
     
@@ -126,3 +287,7 @@ class ImageCompressor:
                 return f"{size_bytes:.1f}{unit}"
             size_bytes /= 1024.0
         return f"{size_bytes:.1f}TB"
+
+def _compress_file_worker(file_path: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Process pool entry point for compressing one image"""
+    return ImageCompressor().compress_file(file_path, settings)
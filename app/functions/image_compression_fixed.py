@@ -3,6 +3,7 @@ import os
 import uuid
 from typing import Dict, Any, List
 from app.config import Config
+from app.functions.image_compression import draft_to_fit, encode_to_target_size, RESIZE_REDUCING_GAP
 
 class ImageCompressor:
     def __init__(self):
@@ -21,9 +22,12 @@ class ImageCompressor:
         max_width = parameters.get('max_width', 1920)  # Default max width
         max_height = parameters.get('max_height', 1080)  # Default max height
         output_format = parameters.get('format', 'AUTO').upper()
+        draft_decode = parameters.get('draft_decode', Config.IMAGE_DRAFT_DECODE)
+        target_size_kb = parameters.get('target_size_kb')
         
         # Validate quality (keep reasonable range for compression)
         quality = max(20, min(90, int(quality)))
+        target_bytes = int(float(target_size_kb) * 1024) if target_size_kb else None
         
         compressed_files = []
         compression_stats = []
@@ -40,6 +44,10 @@ class ImageCompressor:
                 with Image.open(file_path) as img:
                     original_width, original_height = img.size
                     
+                    # Decode large JPEGs at a reduced scale before anything loads the pixels
+                    if draft_decode:
+                        draft_to_fit(img, *self._compression_bounds(original_width, original_height, max_width, max_height))
+                    
                     # Determine best output format for maximum compression
                     if output_format == 'AUTO':
                         # For photos: JPEG is almost always smaller
@@ -57,24 +65,43 @@ class ImageCompressor:
                     processed_img = self._optimize_image_for_format(img, best_format)
                     
                     # Always resize for compression - this is key for size reduction!
-                    processed_img = self._resize_for_compression(processed_img, max_width, max_height)
+                    processed_img = self._resize_for_compression(processed_img, max_width, max_height,
+                                                                 (original_width, original_height) if draft_decode else None)
                     
                     # Generate output filename
                     original_name = os.path.splitext(os.path.basename(file_path))[0]
                     output_filename = f"{original_name}_compressed_{uuid.uuid4().hex[:8]}.{best_format.lower()}"
                     output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
                     
-                    # Save with maximum compression settings
-                    self._save_with_max_compression(processed_img, output_path, best_format, quality)
-                    
-                    # Verify we actually reduced the size
-                    compressed_size = os.path.getsize(output_path)
+                    quality_used = quality
+                    encode_count = 1
+                    target_met = None
                     
-                    # If compressed file is larger, try more aggressive compression
-                    if compressed_size >= original_size:
-                        processed_img = self._apply_aggressive_compression(processed_img, max_width // 2, max_height // 2)
-                        self._save_with_max_compression(processed_img, output_path, 'JPEG', quality // 2)
+                    if target_bytes and best_format in ('JPEG', 'WEBP'):
+                        # Search quality in memory and write only the winning encoding
+                        def save(image: Image.Image, target, image_quality: int):
+                            self._save_with_max_compression(image, target, best_format, image_quality)
+                        
+                        processed_img, encoded, quality_used, encode_count, target_met = encode_to_target_size(
+                            processed_img, save, quality, target_bytes
+                        )
+                        with open(output_path, 'wb') as f:
+                            f.write(encoded)
+                        compressed_size = len(encoded)
+                    else:
+                        # Save with maximum compression settings
+                        self._save_with_max_compression(processed_img, output_path, best_format, quality)
+                        
+                        # Verify we actually reduced the size
                         compressed_size = os.path.getsize(output_path)
+                        
+                        # If compressed file is larger, try more aggressive compression
+                        if compressed_size >= original_size:
+                            processed_img = self._apply_aggressive_compression(processed_img, max_width // 2, max_height // 2)
+                            self._save_with_max_compression(processed_img, output_path, 'JPEG', quality // 2)
+                            compressed_size = os.path.getsize(output_path)
+                            quality_used = quality // 2
+                            encode_count = 2
                     
                     compression_ratio = (1 - compressed_size / original_size) * 100
                     
@@ -86,6 +113,9 @@ class ImageCompressor:
                         'original_dimensions': f"{original_width}x{original_height}",
                         'new_dimensions': f"{processed_img.width}x{processed_img.height}",
                         'format': best_format,
+                        'quality_used': quality_used,
+                        'encode_count': encode_count,
+                        'target_met': target_met,
                         'size_reduction': self._format_file_size(original_size - compressed_size)
                     })
                     
@@ -111,6 +141,7 @@ class ImageCompressor:
                 "total_space_saved": self._format_file_size(total_savings),
                 "settings_used": {
                     "quality": quality,
+                    "target_size_kb": target_size_kb,
                     "max_dimensions": f"{max_width}x{max_height}",
                     "format_strategy": output_format
                 }
@@ -138,9 +169,21 @@ class ImageCompressor:
         
         return img
     
-    def _resize_for_compression(self, img: Image.Image, max_width: int, max_height: int) -> Image.Image:
-        """Aggressively resize image for compression"""
-        original_width, original_height = img.size
+    def _compression_bounds(self, width: int, height: int, max_width: int, max_height: int) -> tuple:
+        """Get the box an image of this size is resized to fit into"""
+        if width > max_width or height > max_height:
+            return max_width, max_height
+        if width > 1600 or height > 1200:
+            return 1600, 1200
+        return width * 0.9, height * 0.9
+    
+    def _resize_for_compression(self, img: Image.Image, max_width: int, max_height: int,
+                                source_size: tuple = None) -> Image.Image:
+        """Aggressively resize image for compression
+        
+        source_size is the size before draft decoding, so the target matches a full decode.
+        """
+        original_width, original_height = source_size or img.size
         
         # Always reduce very large images
         if original_width > max_width or original_height > max_height:
@@ -159,7 +202,8 @@ class ImageCompressor:
         new_width = max(new_width, 200)
         new_height = max(new_height, 200)
         
-        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        reducing_gap = RESIZE_REDUCING_GAP if source_size else None
+        return img.resize((new_width, new_height), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
     
     def _apply_aggressive_compression(self, img: Image.Image, max_width: int, max_height: int) -> Image.Image:
         """Apply very aggressive compression when normal compression fails"""
@@ -172,8 +216,8 @@ class ImageCompressor:
         
         return img
     
-    def _save_with_max_compression(self, img: Image.Image, output_path: str, format_type: str, quality: int):
-        """Save image with maximum compression settings"""
+    def _save_with_max_compression(self, img: Image.Image, output_path, format_type: str, quality: int):
+        """Save image with maximum compression settings to a path or file object"""
         save_kwargs = {'format': format_type}
         
         if format_type == 'JPEG':
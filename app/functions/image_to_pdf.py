@@ -1,13 +1,196 @@
-from PIL import Image
+from PIL import Image, ImageOps
 from reportlab.lib.pagesizes import letter, A4, legal
-from reportlab.platypus import SimpleDocTemplate, Image as RLImage, PageBreak
-from reportlab.lib.units import inch
+import asyncio
+import concurrent.futures
+import hashlib
+import io
+import math
 import os
+import time
 import uuid
-from typing import Dict, Any, List
+import zlib
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from app.config import Config
+from app.functions.executor import ASYNC, ExecutorBusyError, OrderedPipeline, cpu_executor
+from app.functions.image_compression import draft_to_fit, RESIZE_REDUCING_GAP
+from app.functions.pdf_writer import StreamingPdfWriter
+
+# JPEG modes a PDF can display without re-encoding
+JPEG_COLOR_SPACES = {'L': 'DeviceGray', 'RGB': 'DeviceRGB', 'CMYK': 'DeviceCMYK'}
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+def _jpeg_stream(data: bytes, img: Image.Image) -> Dict[str, Any]:
+    # Adobe CMYK JPEGs store inverted values
+    decode = '[1 0 1 0 1 0 1 0]' if img.mode == 'CMYK' and 'adobe' in img.info else None
+    return {
+        "data": data, "width": img.width, "height": img.height,
+        "color_space": JPEG_COLOR_SPACES[img.mode], "filter_name": 'DCTDecode', "decode": decode
+    }
+
+def _encode_pixels(img: Image.Image, jpeg_quality: Optional[int] = None) -> Dict[str, Any]:
+    """Encode decoded pixels as a JPEG (when jpeg_quality is given) or losslessly"""
+    # Transparent and palette images become JPEGs, as before, but in memory
+    if img.mode in ('RGBA', 'P', 'LA', 'PA'):
+        img = img.convert('RGB')
+        jpeg_quality = jpeg_quality or 95
+
+    if jpeg_quality:
+        if img.mode not in JPEG_COLOR_SPACES:
+            img = img.convert('RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=jpeg_quality)
+        encoded = buffer.getvalue()
+        with Image.open(io.BytesIO(encoded)) as jpeg:
+            return _jpeg_stream(encoded, jpeg)
+
+    # Everything else is stored losslessly as deflated pixels
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return {
+        "data": zlib.compress(img.tobytes(), 6), "width": img.width, "height": img.height,
+        "color_space": 'DeviceGray' if img.mode == 'L' else 'DeviceRGB', "filter_name": 'FlateDecode'
+    }
+
+def _prepare_image(data: bytes, frame_width: float, frame_height: float, dpi: int, quality: int) -> Dict[str, Any]:
+    """
+    Encode an image for embedding and work out its size on the page
+
+    Images are shown upright (EXIF orientation applied) at up to one pixel per
+    point and never upscaled. When an image has more pixels than dpi needs at
+    that size it is downsampled first; otherwise JPEG bytes are embedded as they are.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        source_format = img.format
+        orientation = img.getexif().get(0x0112, 1)
+        transposed = orientation in TRANSPOSED_ORIENTATIONS
+        width, height = (img.height, img.width) if transposed else img.size
+
+        # Calculate scaling to fit page
+        width_ratio = frame_width / width
+        height_ratio = frame_height / height
+        scale_ratio = min(width_ratio, height_ratio, 1.0)  # Don't upscale
+        display_width = width * scale_ratio
+        display_height = height * scale_ratio
+
+        target_size = None
+        if dpi:
+            target_size = (
+                max(1, math.ceil(display_width * dpi / 72)),
+                max(1, math.ceil(display_height * dpi / 72))
+            )
+            if target_size[0] >= width or target_size[1] >= height:
+                target_size = None
+
+        if target_size is None and orientation == 1 and source_format == 'JPEG' and img.mode in JPEG_COLOR_SPACES:
+            # JPEGs are embedded byte-for-byte; the PDF viewer decodes them
+            image = _jpeg_stream(data, img)
+            image["passthrough"] = True
+        else:
+            if target_size is not None:
+                draft_to_fit(img, *(target_size[::-1] if transposed else target_size))
+            if orientation != 1:
+                img = ImageOps.exif_transpose(img)
+            if target_size is not None:
+                img = img.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+            # JPEG sources stay JPEGs; lossless sources stay lossless
+            jpeg_quality = None
+            if source_format == 'JPEG':
+                jpeg_quality = quality if target_size is not None else 95
+            image = _encode_pixels(img, jpeg_quality)
+
+        image["downsampled"] = target_size is not None
+        image["display_width"] = display_width
+        image["display_height"] = display_height
+        return image
+
+def _prepare_page_worker(image_path: str, frame_width: float, frame_height: float, dpi: int, quality: int) -> Dict[str, Any]:
+    """Process pool entry point: decode, orient, downsample and encode one image"""
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        return _prepare_image(data, frame_width, frame_height, dpi, quality)
+    except Exception as e:
+        return {"error": str(e)}
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _assemble_pdf(output_path: str, image_files: List[str], page_size: Tuple[float, float], margin: float,
+                  dpi: int, submit: Callable, workers: int, budget: int) -> Dict[str, int]:
+    """
+    Write one page per image to output_path, in input order
+
+    Each distinct image (by content hash) is prepared once through submit(); at
+    most 2 x `workers` images and `budget` bytes of source data are in flight at
+    once. Pages are written here as soon as the oldest image is ready, so memory
+    stays bounded however many images there are.
+    """
+    page_width = page_size[0] - 2 * margin
+    page_height = page_size[1] - 2 * margin
+    placed = {}  # source hash -> (image name, width, height), or None if it could not be prepared
+    stats = {"passthrough_jpegs": 0, "downsampled_images": 0, "failed_images": 0}
+
+    with StreamingPdfWriter(output_path) as writer:
+        def write_page(page: Tuple[str, str], image: Optional[Dict[str, Any]]):
+            image_path, key = page
+            if image is not None:
+                if "error" in image:
+                    print(f"Warning: Could not process image {image_path}: {image['error']}")
+                    placed[key] = None
+                else:
+                    stats["passthrough_jpegs"] += bool(image.pop("passthrough", False))
+                    stats["downsampled_images"] += image.pop("downsampled")
+                    display_width = image.pop("display_width")
+                    display_height = image.pop("display_height")
+                    placed[key] = (writer.add_image(key=key, **image), display_width, display_height)
+
+            if placed.get(key) is None:
+                # Repeats of an image that failed fail too
+                stats["failed_images"] += 1
+                return
+            name, final_width, final_height = placed[key]
+
+            # Centre the image at the top of the page
+            x = margin + (page_width - final_width) / 2
+            y = page_size[1] - margin - final_height
+            writer.add_page(page_size[0], page_size[1], [(name, x, y, final_width, final_height)])
+
+        submitted = set()
+        with OrderedPipeline(submit, write_page, 2 * workers, budget) as pipeline:
+            for image_path in image_files:
+                try:
+                    size = os.path.getsize(image_path)
+                    key = _file_digest(image_path)
+                except OSError as e:
+                    print(f"Warning: Could not process image {image_path}: {str(e)}")
+                    stats["failed_images"] += 1
+                    continue
+
+                # A repeated image becomes another page showing the copy already prepared
+                if key in submitted:
+                    pipeline.add((image_path, key))
+                else:
+                    pipeline.submit((image_path, key), size,
+                                    image_path, page_width, page_height, dpi, Config.DEFAULT_IMAGE_QUALITY)
+                    submitted.add(key)
+            pipeline.finish()
+
+        if not writer.page_count:
+            raise ValueError("No images could be processed")
+
+        stats["pages"] = writer.page_count
+        stats["unique_images"] = writer.images_written
+    return stats
 
 class ImageToPdfConverter:
+    # Orchestrates on the event loop; images are prepared in the process pool
+    execution_mode = ASYNC
+    
     def __init__(self):
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
         self.page_sizes = {
@@ -25,17 +208,29 @@ class ImageToPdfConverter:
         page_size = parameters.get('page_size', 'A4').upper()
         orientation = parameters.get('orientation', 'portrait').lower()
         margin = parameters.get('margin', 50)
+        dpi = parameters.get('dpi', Config.IMAGE_PDF_DPI)
+        workers = max(1, min(Config.IMAGE_PDF_WORKERS, cpu_executor.max_workers))
+        budget = max(1, Config.IMAGE_PDF_INFLIGHT_MB) * 1024 * 1024
         
         # Validate page size
         if page_size not in self.page_sizes:
             page_size = 'A4'
         
         # Filter image files
-        image_files = [f for f in file_paths if self._is_image_file(f)]        
+        image_files = [f for f in file_paths if self._is_image_file(f)]
         if not image_files:
             raise ValueError("No valid image files found for conversion")
         
+        # A long PDF submits one image per page; turn it away now rather than partway through
+        cpu_executor.check_capacity()
+        
         try:
+            # Accept "300dpi" as well as 300; 0 keeps the original resolution
+            try:
+                dpi = int(str(dpi or 0).lower().removesuffix('dpi').strip())
+            except ValueError:
+                raise ValueError(f"Invalid dpi: {dpi!r}")
+            
             # Generate output filename
             output_filename = f"images_to_pdf_{uuid.uuid4().hex[:8]}.pdf"
             output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
@@ -43,91 +238,42 @@ class ImageToPdfConverter:
             # Ensure output directory exists
             os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
             
-            # Set up PDF document
+            # Set up page size
             page_size_tuple = self.page_sizes[page_size]
             if orientation == 'landscape':
                 page_size_tuple = (page_size_tuple[1], page_size_tuple[0])
             
-            pdf_doc = SimpleDocTemplate(
-                output_path,
-                pagesize=page_size_tuple,
-                rightMargin=margin,
-                leftMargin=margin,
-                topMargin=margin,
-                bottomMargin=margin
-            )
-              # Calculate available space
-            page_width = page_size_tuple[0] - 2 * margin
-            page_height = page_size_tuple[1] - 2 * margin
-            
-            story = []
-            temp_files = []  # Keep track of temp files to clean up later
-            
-            for i, image_path in enumerate(image_files):
-                try:
-                    # Open image to get dimensions
-                    with Image.open(image_path) as img:
-                        img_width, img_height = img.size
-                        
-                        # Calculate scaling to fit page
-                        width_ratio = page_width / img_width
-                        height_ratio = page_height / img_height
-                        scale_ratio = min(width_ratio, height_ratio, 1.0)  # Don't upscale
-                        
-                        # Calculate final dimensions
-                        final_width = img_width * scale_ratio
-                        final_height = img_height * scale_ratio
-                        
-                        # Convert image to RGB if necessary
-                        if img.mode in ('RGBA', 'P'):
-                            # Create a temporary RGB image
-                            temp_filename = f"temp_{uuid.uuid4().hex[:8]}.jpg"
-                            temp_full_path = os.path.join(Config.OUTPUT_DIR, temp_filename)
-                            
-                            rgb_img = img.convert('RGB')
-                            rgb_img.save(temp_full_path, 'JPEG', quality=95)
-                            
-                            # Add to PDF and track temp file
-                            rl_image = RLImage(temp_full_path, width=final_width, height=final_height)
-                            story.append(rl_image)
-                            temp_files.append(temp_full_path)
-                        else:
-                            # Add image directly to PDF
-                            rl_image = RLImage(image_path, width=final_width, height=final_height)
-                            story.append(rl_image)
-                    
-                    # Add page break between images (except for the last one)
-                    if i < len(image_files) - 1:
-                        story.append(PageBreak())
-                        
-                except Exception as e:
-                    print(f"Warning: Could not process image {image_path}: {str(e)}")
-                    continue
-            
-            if not story:
-                raise ValueError("No images could be processed")
+            # Images are prepared in the process pool; this thread writes the pages in input order
+            loop = asyncio.get_running_loop()
             
-            # Build PDF first
-            pdf_doc.build(story)
+            def submit(*args) -> concurrent.futures.Future:
+                return asyncio.run_coroutine_threadsafe(cpu_executor.run_subtask(_prepare_page_worker, *args), loop)
             
-            # Clean up temp files after PDF is built
-            for temp_file in temp_files:
-                try:
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-                except Exception as cleanup_error:
-                    print(f"Warning: Could not cleanup temp file {temp_file}: {cleanup_error}")
+            start_time = time.perf_counter()
+            stats = await asyncio.to_thread(
+                _assemble_pdf, output_path, image_files, page_size_tuple, margin, dpi, submit, workers, budget
+            )
             
             return {
                 "output_path": os.path.basename(output_path),
                 "total_files_processed": len(image_files),
+                "pages": stats["pages"],
+                "failed_files": stats["failed_images"],
+                "unique_images": stats["unique_images"],
+                "passthrough_jpegs": stats["passthrough_jpegs"],
+                "downsampled_images": stats["downsampled_images"],
+                "workers": workers,
+                "total_time": f"{time.perf_counter() - start_time:.3f}s",
                 "conversion_settings": {
                     "page_size": page_size,
                     "orientation": orientation,
-                    "margin": margin
+                    "margin": margin,
+                    "dpi": dpi
                 }
             }
-            
+        
+        except ExecutorBusyError:
+            raise
         except Exception as e:
             raise ValueError(f"Error converting images to PDF: {str(e)}")
     
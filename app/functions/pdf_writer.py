@@ -0,0 +1,131 @@
+import hashlib
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+class StreamingPdfWriter:
+    """
+    Minimal PDF writer for image pages
+
+    Every object is written to disk as soon as it is added, so memory use does
+    not grow with image data: per page only the page and content stream offsets
+    (8 bytes each) and the page id are kept until close(). Images are embedded as
+    ready-made streams (e.g. JPEG bytes as DCTDecode), and an image added twice
+    with the same key is written once and shared between pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._offsets = array('Q', [0, 0, 0])  # indexed by object id; 1 and 2 are written last
+        self._page_ids = array('L')
+        self._images: Dict[str, Tuple[str, int, int, int]] = {}
+        self._image_ids: Dict[str, int] = {}
+        self.images_written = 0
+        self.images_reused = 0
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Never leave a truncated PDF behind
+            self._file.close()
+            os.remove(self.path)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def get_image(self, key: str) -> Optional[Tuple[str, int, int]]:
+        """Get (name, width, height) of an image already written under key"""
+        existing = self._images.get(key)
+        if existing is None:
+            return None
+        self.images_reused += 1
+        return existing[0], existing[2], existing[3]
+
+    def add_image(self, data: bytes, width: int, height: int, color_space: str = 'DeviceRGB',
+                  filter_name: Optional[str] = 'DCTDecode', bits_per_component: int = 8,
+                  decode: Optional[str] = None, key: Optional[str] = None) -> str:
+        """
+        Write an image XObject and return its resource name
+
+        data must already be encoded for filter_name. key identifies identical
+        images; it defaults to the SHA-256 of the data.
+        """
+        key = key or hashlib.sha256(data).hexdigest()
+        existing = self.get_image(key)
+        if existing is not None:
+            return existing[0]
+
+        entries = [
+            '/Type /XObject', '/Subtype /Image',
+            f'/Width {width}', f'/Height {height}',
+            f'/ColorSpace /{color_space}', f'/BitsPerComponent {bits_per_component}'
+        ]
+        if filter_name:
+            entries.append(f'/Filter /{filter_name}')
+        if decode:
+            entries.append(f'/Decode {decode}')
+
+        obj_id = self._allocate()
+        self._write_stream(obj_id, ' '.join(entries), data)
+        name = f'Im{len(self._images) + 1}'
+        self._images[key] = (name, obj_id, width, height)
+        self._image_ids[name] = obj_id
+        self.images_written += 1
+        return name
+
+    def add_page(self, width: float, height: float, placements: List[Tuple[str, float, float, float, float]]):
+        """Write a page drawing images, each given as (name, x, y, width, height) in points"""
+        content = ''.join(
+            f'q {w:.4f} 0 0 {h:.4f} {x:.4f} {y:.4f} cm /{name} Do Q\n'
+            for name, x, y, w, h in placements
+        ).encode('ascii')
+        content_id = self._allocate()
+        self._write_stream(content_id, '', content)
+
+        xobjects = ' '.join(f'/{name} {self._image_ids[name]} 0 R' for name in dict.fromkeys(p[0] for p in placements))
+        page_id = self._allocate()
+        self._write_object(
+            page_id,
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.4f} {height:.4f}] '
+            f'/Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>'
+        )
+        self._page_ids.append(page_id)
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        if self._file.closed:
+            return
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>')
+        self._write_object(1, '<< /Type /Catalog /Pages 2 0 R >>')
+
+        xref_offset = self._file.tell()
+        size = len(self._offsets)
+        self._file.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode('ascii'))
+        for start in range(1, size, 1024):
+            self._file.write(''.join(
+                f'{offset:010d} 00000 n \n' for offset in self._offsets[start:start + 1024]
+            ).encode('ascii'))
+        self._file.write(f'trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+        self._file.close()
+
+    def _allocate(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+
+    def _write_object(self, obj_id: int, body: str):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f'{obj_id} 0 obj\n{body}\nendobj\n'.encode('ascii'))
+
+    def _write_stream(self, obj_id: int, entries: str, data: bytes):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f'{obj_id} 0 obj\n<< {entries} /Length {len(data)} >>\nstream\n'.encode('ascii'))
+        self._file.write(data)
+        self._file.write(b'\nendstream\nendobj\n')
@@ -3,10 +3,13 @@ import uuid
 from typing import Dict, Any, List
 from app.client.sarvam_client import SarvamClient
 from app.config import Config
+from app.functions.executor import IO_BOUND
 
 class SpeechToTextConverter:
     """Convert speech/audio files to text using Sarvam AI"""
     
+    execution_mode = IO_BOUND
+    
     def __init__(self):
         self.supported_formats = ['.wav', '.mp3', '.m4a', '.flac', '.aac']
         self.sarvam_client = SarvamClient()
@@ -1,14 +1,28 @@
+import asyncio
+import codecs
+import concurrent.futures
+import itertools
 import os
+import struct
+import zlib
 import zipfile
-import shutil
 import uuid
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
 from app.config import Config
+from app.functions.executor import ASYNC, OrderedPipeline, cpu_executor
+
+TEXT_EXTENSIONS = ['.txt', '.html', '.css', '.js', '.py', '.java', '.xml', '.json', '.md']
+
+# Small text members are sent to the process pool in batches of up to this many bytes / members
+BATCH_MAX_BYTES = 1024 * 1024
+BATCH_MAX_MEMBERS = 256
 
 class TextReplacer:
     """Replace text in ZIP archive files"""
     
+    execution_mode = ASYNC
+    
     async def execute(self, parameters: Dict[str, Any], file_paths: List[str]) -> Dict[str, Any]:
         """Execute the text replacement function"""
         if not file_paths:
@@ -19,75 +33,437 @@ class TextReplacer:
         if not zip_files:
             raise ValueError("No ZIP files found for text replacement")
           # Get parameters
-        find_text = parameters.get("find_text", "")
-        replace_text = parameters.get("replace_text", "")
-        case_sensitive = parameters.get("case_sensitive", False)
-        
-        if not find_text:
-            raise ValueError("Find text parameter is required")
+        replacer = MultiReplacer(_parse_replacements(parameters))
         
         zip_path = zip_files[0]
         replace_id = uuid.uuid4().hex[:8]
-        extract_folder = f"text_replaced_{replace_id}"
-        output_dir = os.path.join(Config.OUTPUT_DIR, extract_folder)
+        archive_file = f"text_replaced_{replace_id}.zip"
+        archive_path = os.path.join(Config.OUTPUT_DIR, archive_file)
+        chunk_chars = max(1, Config.TEXT_REPLACE_CHUNK_KB) * 1024
+        workers = max(1, min(Config.TEXT_REPLACE_WORKERS, cpu_executor.max_workers))
+        budget = max(1, Config.TEXT_REPLACE_INFLIGHT_MB) * 1024 * 1024
+        
+        # A large archive turns into hundreds of batches; a full pool rejects it here or not at all
+        cpu_executor.check_capacity()
+        
+        # Batches of small text members are replaced and deflated in the process
+        # pool; this thread writes everything to the new archive in the original order
+        loop = asyncio.get_running_loop()
         
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
+        def submit(*args) -> concurrent.futures.Future:
+            return asyncio.run_coroutine_threadsafe(cpu_executor.run_subtask(_replace_batch_worker, *args), loop)
         
-        # Extract and process files
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(output_dir)
+        try:
+            file_counts, pattern_counts, batches = await asyncio.to_thread(
+                _rewrite_archive, zip_path, archive_path, replacer, chunk_chars, submit, workers, budget, self._is_text_file
+            )
+        except BaseException:
+            # Never leave a half-written archive behind
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
+            raise
         
-        # Replace text in text files
-        modified_files = []
-        for root, _, files in os.walk(output_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if self._is_text_file(file_path):
-                    if self._replace_text_in_file(file_path, find_text, replace_text, case_sensitive):
-                        rel_path = os.path.relpath(file_path, output_dir)
-                        modified_files.append(rel_path)
+        pattern_summary = [
+            {"find": find, "replace": replace, "case_sensitive": case_sensitive, "count": count}
+            for (find, replace, case_sensitive), count in zip(replacer.replacements, pattern_counts)
+        ]
           # Create summary file
         summary_file = f"replacement_summary_{replace_id}.txt"
         summary_path = os.path.join(Config.OUTPUT_DIR, summary_file)
         
-        with open(summary_path, 'w') as f:
+        with open(summary_path, 'w', encoding='utf-8') as f:
             f.write(f"Text Replacement Summary\n")
             f.write(f"=======================\n")
             f.write(f"Source: {os.path.basename(zip_path)}\n")
-            f.write(f"Find text: '{find_text}'\n")
-            f.write(f"Replace text: '{replace_text}'\n")
-            f.write(f"Case sensitive: {case_sensitive}\n")
-            f.write(f"Modified files: {len(modified_files)}\n\n")
-            f.write("Files modified:\n")
-            for file in modified_files:
-                f.write(f"- {file}\n")
+            f.write(f"Modified files: {len(file_counts)}\n")
+            f.write(f"Replacements: {sum(pattern_counts)}\n\n")
+            f.write("Patterns:\n")
+            for item in pattern_summary:
+                sensitivity = "case sensitive" if item["case_sensitive"] else "case insensitive"
+                f.write(f"- '{item['find']}' -> '{item['replace']}' ({sensitivity}): {item['count']}\n")
+            f.write("\nFiles modified:\n")
+            for file, count in file_counts.items():
+                f.write(f"- {file}: {count}\n")
         
         return {
-            "output_path": summary_file,
-            "modified_folder": extract_folder,
-            "modified_files": len(modified_files)
+            "output_path": archive_file,
+            "summary_file": summary_file,
+            "modified_files": len(file_counts),
+            "replacements": sum(pattern_counts),
+            "pattern_counts": pattern_summary,
+            "file_counts": file_counts,
+            "parallel_batches": batches,
+            "workers": workers
         }
     
     def _is_text_file(self, file_path):
         """Check if file is a text file based on extension"""
-        text_extensions = ['.txt', '.html', '.css', '.js', '.py', '.java', '.xml', '.json', '.md']
         _, ext = os.path.splitext(file_path.lower())
-        return ext in text_extensions
+        return ext in TEXT_EXTENSIONS
         
-    def _replace_text_in_file(self, file_path, find_text, replace_text, case_sensitive):
-        """Replace text in a file"""
-        try:
-            with open(file_path, 'r', errors='ignore') as f:
-                content = f.read()
-                
-            flags = 0 if case_sensitive else re.IGNORECASE
-            new_content, count = re.subn(re.escape(find_text), replace_text, content, flags=flags)
+def _parse_replacements(parameters: Dict[str, Any]) -> List[Tuple[str, str, bool]]:
+    """
+    Collect (find, replace, case_sensitive) triples from the parameters
+    
+    Accepts a 'replacements' list of {"find", "replace", "case_sensitive"} dicts or
+    [find, replace] pairs, and the single find_text/replace_text form (old_keyword/
+    new_keyword are accepted as aliases). case_sensitive applies to pairs that do
+    not set their own.
+    """
+    default_case = bool(parameters.get("case_sensitive", False))
+    replacements = []
+    
+    for item in parameters.get("replacements") or []:
+        if isinstance(item, dict):
+            find = item.get("find", item.get("find_text", ""))
+            replace = item.get("replace", item.get("replace_text", ""))
+            case_sensitive = bool(item.get("case_sensitive", default_case))
+        elif isinstance(item, (list, tuple)) and len(item) >= 2:
+            find, replace = item[0], item[1]
+            case_sensitive = bool(item[2]) if len(item) > 2 else default_case
+        else:
+            raise ValueError(f"Invalid replacement: {item!r}")
+        replacements.append((str(find), str(replace), case_sensitive))
+    
+    find_text = parameters.get("find_text") or parameters.get("old_keyword")
+    if find_text:
+        replace_text = parameters.get("replace_text", parameters.get("new_keyword", ""))
+        replacements.append((str(find_text), str(replace_text or ""), default_case))
+    
+    replacements = [item for item in replacements if item[0]]
+    if not replacements:
+        raise ValueError("Find text parameter is required")
+    return replacements
+
+class MultiReplacer:
+    """
+    Apply many find/replace pairs in one pass
+    
+    All find strings are compiled once into a single regex shaped as a prefix
+    trie, so each text position is checked against one character class instead of
+    every pair in turn. Case-insensitive pairs are matched against a lowercased
+    copy of the text rather than with re.IGNORECASE, which is several times slower.
+    At any position the longest find string wins; when case-sensitive and
+    insensitive pairs are mixed, case-sensitive ones are tried first. When the
+    same find string is given twice, the first pair wins.
+    """
+    
+    def __init__(self, replacements: List[Tuple[str, str, bool]]):
+        self.replacements = replacements
+        self.sensitive: Dict[str, int] = {}
+        self.insensitive: Dict[str, int] = {}
+        for index, (find, _, case_sensitive) in enumerate(replacements):
+            if case_sensitive:
+                self.sensitive.setdefault(find, index)
+            else:
+                self.insensitive.setdefault(find.lower(), index)
+        
+        self.max_match = max(len(find) for find in list(self.sensitive) + list(self.insensitive))
+        if self.sensitive and self.insensitive:
+            # Mixed: one pattern over the original text, insensitive part scoped with (?i:)
+            self.pattern = re.compile(
+                f"(?P<sensitive>{_trie_pattern(self.sensitive)})|(?P<insensitive>(?i:{_trie_pattern(self.insensitive)}))"
+            )
+            self.lowered = False
+        elif self.sensitive:
+            self.pattern = re.compile(_trie_pattern(self.sensitive))
+            self.lowered = False
+        else:
+            self.pattern = re.compile(_trie_pattern(self.insensitive))
+            self.lowered = True
+            originals = [find for find, _, case_sensitive in replacements if not case_sensitive]
+            self.fallback_pattern = re.compile(_trie_pattern(originals), re.IGNORECASE)
+    
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield (start, end, pair index) for every non-overlapping match"""
+        if self.lowered:
+            lowered = text.lower()
+            if len(lowered) == len(text):
+                for match in self.pattern.finditer(lowered):
+                    yield match.start(), match.end(), self.insensitive[match.group(0)]
+                return
+            # Lowercasing changed offsets (rare non-ASCII case), so match case-insensitively instead
+            matches = self.fallback_pattern.finditer(text)
+        else:
+            matches = self.pattern.finditer(text)
+        
+        for match in matches:
+            if self.lowered or match.lastgroup == 'insensitive':
+                # re's case folding can differ from str.lower() for a few characters
+                index = self.insensitive.get(match.group(0).lower())
+            else:
+                index = self.sensitive[match.group(0)]
+            if index is not None:
+                yield match.start(), match.end(), index
+    
+    def subn(self, text: str) -> Tuple[str, List[int]]:
+        """Replace every match in text; returns the new text and per-pair counts"""
+        counts = [0] * len(self.replacements)
+        parts = []
+        position = 0
+        for start, end, index in self.finditer(text):
+            parts.append(text[position:start])
+            parts.append(self.replacements[index][1])
+            counts[index] += 1
+            position = end
+        if not parts:
+            return text, counts
+        parts.append(text[position:])
+        return ''.join(parts), counts
+
+def _trie_pattern(words) -> str:
+    """Build a regex matching any of the words, factored into a prefix trie (longest match first)"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # The word ending here is optional, so the greedy longer continuations are tried first
+        return f'(?:{body})?' if '' in node else body
+    
+    return build(trie)
+
+def _iter_text(source: zipfile.ZipFile, info: zipfile.ZipInfo, chunk_chars: int):
+    """Decode a member in chunks; undecodable bytes survive the round trip as surrogates"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='surrogateescape')
+    with source.open(info) as member:
+        for block in iter(lambda: member.read(chunk_chars), b''):
+            text = decoder.decode(block)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+def _scan_chunks(chunks, replacer: MultiReplacer):
+    """
+    Run the replacer over chunked text as if it were one string
+    
+    The last max_match - 1 characters of each chunk are held back and scanned with
+    the next one, so matches spanning a chunk boundary are still found. Yields
+    (text, pair index) pairs: text that precedes a match, and the index of the
+    matching pair (None for trailing text).
+    """
+    overlap = max(0, replacer.max_match - 1)
+    carry = ''
+    # A final empty chunk flushes the held-back tail with no overlap
+    for chunk, final in itertools.chain(((chunk, False) for chunk in chunks), [('', True)]):
+        buffer = carry + chunk
+        safe_end = len(buffer) if final else len(buffer) - overlap
+        position = 0
+        for start, end, index in replacer.finditer(buffer):
+            if start >= safe_end:
+                break
+            yield buffer[position:start], index
+            position = end
+        emit_to = max(position, safe_end)
+        if emit_to > position:
+            yield buffer[position:emit_to], None
+        carry = buffer[emit_to:]
+
+def _member_contains(source: zipfile.ZipFile, info: zipfile.ZipInfo, replacer: MultiReplacer, chunk_chars: int) -> bool:
+    """Check whether a member has at least one match, stopping at the first one"""
+    chunks = _scan_chunks(_iter_text(source, info, chunk_chars), replacer)
+    return any(index is not None for _, index in chunks)
+
+def _new_entry(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """Entry for a rewritten member, keeping the original name, time and attributes"""
+    entry = zipfile.ZipInfo(info.filename, info.date_time)
+    entry.external_attr = info.external_attr
+    entry.create_system = info.create_system
+    entry.comment = info.comment
+    entry.compress_type = zipfile.ZIP_DEFLATED
+    entry.file_size = info.file_size  # Only used to decide on ZIP64 up front
+    return entry
+
+def _rewrite_archive(zip_path: str, archive_path: str, replacer: MultiReplacer, chunk_chars: int,
+                     submit: Callable, workers: int, budget: int, is_text_file: Callable) -> Tuple[Dict[str, int], List[int], int]:
+    """
+    Copy zip_path to archive_path with replacements applied, preserving member order
+    
+    Small text members are grouped into batches and handed to submit(); at most
+    2 x `workers` batches (so the pool stays busy while this thread writes) and
+    `budget` bytes of member data are in flight at once. Other members are copied
+    raw, and text members larger than one chunk are streamed here.
+    Returns (per-file counts, per-pair counts, batches submitted).
+    """
+    file_counts = {}
+    pattern_counts = [0] * len(replacer.replacements)
+    
+    def record(name: str, counts: Optional[List[int]]):
+        if counts and sum(counts):
+            file_counts[name] = sum(counts)
+            for index, count in enumerate(counts):
+                pattern_counts[index] += count
+    
+    def write(member: Tuple[str, Any], results: Optional[list]):
+        kind, payload = member
+        if kind == 'raw':
+            _copy_member_raw(source, payload, target)
+        elif kind == 'stream':
+            counts = None
+            if _member_contains(source, payload, replacer, chunk_chars):
+                counts = _replace_member(source, payload, target, replacer, chunk_chars)
+            else:
+                _copy_member_raw(source, payload, target)
+            record(payload.filename, counts)
+        else:
+            for info, outcome in zip(payload, results):
+                if outcome is None:
+                    _copy_member_raw(source, info, target)
+                    continue
+                compressed, crc, size, counts = outcome
+                _write_compressed(target, info, compressed, crc, size)
+                record(info.filename, counts)
+    
+    with zipfile.ZipFile(zip_path, 'r') as source, \
+            zipfile.ZipFile(archive_path, 'w', allowZip64=True) as target, \
+            OrderedPipeline(submit, write, 2 * workers, budget) as pipeline:
+        
+        def flush_batch(batch: List[zipfile.ZipInfo]):
+            pipeline.submit(('batch', batch), sum(info.file_size for info in batch),
+                            zip_path, [info.filename for info in batch], replacer)
+        
+        batch, batch_bytes = [], 0
+        for info in source.infolist():
+            if info.is_dir() or not is_text_file(info.filename) or info.flag_bits & 0x1:
+                kind = 'raw'
+            elif info.file_size > chunk_chars:
+                kind = 'stream'
+            else:
+                batch.append(info)
+                batch_bytes += info.file_size
+                if batch_bytes >= BATCH_MAX_BYTES or len(batch) >= BATCH_MAX_MEMBERS:
+                    flush_batch(batch)
+                    batch, batch_bytes = [], 0
+                continue
             
-            if count > 0:
-                with open(file_path, 'w') as f:
-                    f.write(new_content)
-                return True
-            return False
-        except Exception:
-            return False
+            # Keep archive order: members after an open batch wait for it
+            if batch:
+                flush_batch(batch)
+                batch, batch_bytes = [], 0
+            pipeline.add((kind, info))
+        
+        if batch:
+            flush_batch(batch)
+        pipeline.finish()
+    
+    return file_counts, pattern_counts, pipeline.submitted
+
+# Source archives opened inside pool workers, reused across batches of the same job
+_worker_archives: Dict[tuple, zipfile.ZipFile] = {}
+
+def _replace_batch_worker(zip_path: str, names: List[str], replacer: MultiReplacer) -> List[Optional[tuple]]:
+    """
+    Process pool entry point: replace within a batch of small members
+    
+    Returns, per member, None when nothing matched or (deflated bytes, CRC,
+    uncompressed size, per-pair counts) ready to be written as-is.
+    """
+    stat = os.stat(zip_path)
+    key = (zip_path, stat.st_size, stat.st_mtime_ns)
+    source = _worker_archives.get(key)
+    if source is None:
+        for stale in _worker_archives.values():
+            stale.close()
+        _worker_archives.clear()
+        source = _worker_archives[key] = zipfile.ZipFile(zip_path, 'r')
+    
+    results = []
+    for name in names:
+        text = source.read(name).decode('utf-8', errors='surrogateescape')
+        new_text, counts = replacer.subn(text)
+        if not sum(counts):
+            results.append(None)
+            continue
+        data = new_text.encode('utf-8', errors='surrogateescape')
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        results.append((compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data), counts))
+    return results
+
+def _replace_member(source: zipfile.ZipFile, info: zipfile.ZipInfo, target: zipfile.ZipFile,
+                    replacer: MultiReplacer, chunk_chars: int) -> List[int]:
+    """Stream a member through the replacer into a new deflated entry; returns per-pair counts"""
+    counts = [0] * len(replacer.replacements)
+    chunks = _scan_chunks(_iter_text(source, info, chunk_chars), replacer)
+    with target.open(_new_entry(info), 'w') as out:
+        for text, index in chunks:
+            if index is not None:
+                text += replacer.replacements[index][1]
+                counts[index] += 1
+            if text:
+                out.write(text.encode('utf-8', errors='surrogateescape'))
+    return counts
+
+def _copy_member_raw(source: zipfile.ZipFile, info: zipfile.ZipInfo, target: zipfile.ZipFile,
+                     chunk_size: int = 1024 * 1024):
+    """Copy a member's compressed bytes into the target archive unchanged"""
+    fp = source.fp
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    
+    def blocks():
+        remaining = info.compress_size
+        while remaining > 0:
+            block = fp.read(min(chunk_size, remaining))
+            if not block:
+                raise zipfile.BadZipFile(f"Truncated member: {info.filename}")
+            remaining -= len(block)
+            yield block
+    
+    entry = zipfile.ZipInfo(info.filename, info.date_time)
+    entry.compress_type = info.compress_type
+    entry.comment = info.comment
+    entry.create_system = info.create_system
+    entry.create_version = info.create_version
+    entry.external_attr = info.external_attr
+    entry.internal_attr = info.internal_attr
+    entry.CRC = info.CRC
+    entry.compress_size = info.compress_size
+    entry.file_size = info.file_size
+    entry.flag_bits = info.flag_bits
+    if not info.flag_bits & 0x01:
+        # Sizes go into the local header, so no data descriptor follows the data. Encrypted
+        # members keep bit 3: it decides whether the password check byte is the CRC or the time
+        entry.flag_bits &= ~0x08
+    _write_raw_entry(target, entry, blocks())
+
+def _write_compressed(target: zipfile.ZipFile, info: zipfile.ZipInfo, compressed: bytes, crc: int, size: int):
+    """Write a member that was already deflated elsewhere (e.g. in a pool worker)"""
+    entry = _new_entry(info)
+    entry.CRC = crc
+    entry.compress_size = len(compressed)
+    entry.file_size = size
+    _write_raw_entry(target, entry, [compressed])
+
+def _write_raw_entry(target: zipfile.ZipFile, entry: zipfile.ZipInfo, blocks):
+    """
+    Write a local header and ready-made compressed data
+    
+    zipfile has no public API for this, so the central directory bookkeeping is
+    done the same way ZipFile.write does it.
+    """
+    zip64 = entry.file_size > zipfile.ZIP64_LIMIT or entry.compress_size > zipfile.ZIP64_LIMIT
+    entry.header_offset = target.fp.tell()
+    target.fp.write(entry.FileHeader(zip64))
+    for block in blocks:
+        target.fp.write(block)
+    if entry.flag_bits & 0x08:
+        # The local header holds zeros; the real CRC and sizes follow the data
+        target.fp.write(struct.pack(
+            '<4sLQQ' if zip64 else '<4sLLL', b'PK\x07\x08', entry.CRC, entry.compress_size, entry.file_size
+        ))
+    
+    target.filelist.append(entry)
+    target.NameToInfo[entry.filename] = entry
+    target.start_dir = target.fp.tell()
+    target._didModify = True
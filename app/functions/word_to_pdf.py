@@ -1,14 +1,209 @@
 from docx import Document
 from reportlab.lib.pagesizes import letter, A4, legal
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Flowable
+import asyncio
 import os
+import time
 import uuid
-from typing import Dict, Any, List
+from concurrent.futures.process import BrokenProcessPool
+from xml.sax.saxutils import escape
+from typing import Dict, Any, List, Optional, Tuple
 from app.config import Config
+from app.functions.executor import ASYNC, cpu_executor
+
+# Extra space the converter has always put after every paragraph, on top of spaceAfter
+PARAGRAPH_GAP = 6
+# Words kept per font in the width cache; a full cache is cleared and refilled
+WORD_WIDTH_CACHE_SIZE = 20000
+
+# Built once per process and shared by every document converted in it
+_styles: Dict[str, ParagraphStyle] = {}
+_word_widths: Dict[Tuple[str, float], Dict[str, float]] = {}
+
+def get_styles() -> Dict[str, ParagraphStyle]:
+    """Get the title and body styles, creating them on first use"""
+    if not _styles:
+        styles = getSampleStyleSheet()
+        _styles['title'] = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=30 + PARAGRAPH_GAP,
+        )
+        _styles['normal'] = ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=11,
+            spaceAfter=12 + PARAGRAPH_GAP,
+        )
+    return _styles
+
+def _word_width(word: str, widths: Dict[str, float], font_name: str, font_size: float) -> float:
+    width = widths.get(word)
+    if width is None:
+        # Distinct words never stop growing over a long-lived worker, so cap them
+        if len(widths) >= WORD_WIDTH_CACHE_SIZE:
+            widths.clear()
+        width = widths[word] = stringWidth(word, font_name, font_size)
+    return width
+
+class BodyTextBlock(Flowable):
+    """
+    Consecutive body paragraphs laid out as a single flowable
+
+    Text is treated as plain text and broken into lines greedily, using word
+    widths cached per font (up to WORD_WIDTH_CACHE_SIZE words). Once wrapped, splitting
+    at a page break just slices the line list, so a long run of paragraphs costs
+    one layout pass instead of one Paragraph (and Spacer) per docx paragraph.
+    """
+
+    def __init__(self, paragraphs: List[str], style: ParagraphStyle, lines: Optional[List[Optional[str]]] = None):
+        super().__init__()
+        self.paragraphs = paragraphs
+        self.style = style
+        self.spaceAfter = style.spaceAfter
+        self._lines = lines  # None marks the gap between two paragraphs
+        self._lines_width = None
+
+    def wrap(self, availWidth, availHeight):
+        # Blocks split off another block keep its lines as they are
+        if self.paragraphs and (self._lines is None or self._lines_width != availWidth):
+            self._lines = self._break_lines(availWidth)
+            self._lines_width = availWidth
+        self.width = availWidth
+        self.height = self._height(self._lines)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        self.wrap(availWidth, availHeight)
+        leading = self.style.leading
+        used = 0.0
+        count = 0
+        for line in self._lines:
+            used += self.spaceAfter if line is None else leading
+            if used > availHeight + 1e-6:
+                break
+            count += 1
+        if count == 0 or count >= len(self._lines):
+            return [] if count == 0 else [self]
+
+        first = self._lines[:count]
+        rest = self._lines[count:]
+        while first and first[-1] is None:
+            first.pop()
+        while rest and rest[0] is None:
+            rest.pop(0)
+        if not first:
+            return []
+        return [BodyTextBlock([], self.style, first), BodyTextBlock([], self.style, rest)]
+
+    def draw(self):
+        style = self.style
+        y = self.height - style.fontSize
+        text = self.canv.beginText(0, y)
+        text.setFont(style.fontName, style.fontSize)
+        for line in self._lines:
+            if line is None:
+                y -= self.spaceAfter
+                continue
+            text.setTextOrigin(0, y)
+            text.textOut(line)
+            y -= style.leading
+        self.canv.drawText(text)
+
+    def _height(self, lines: List[Optional[str]]) -> float:
+        gaps = lines.count(None)
+        return (len(lines) - gaps) * self.style.leading + gaps * self.spaceAfter
+
+    def _break_lines(self, max_width: float) -> List[Optional[str]]:
+        style = self.style
+        widths = _word_widths.setdefault((style.fontName, style.fontSize), {})
+        space = _word_width(' ', widths, style.fontName, style.fontSize)
+        lines = []
+        for paragraph in self.paragraphs:
+            if lines:
+                lines.append(None)
+            current = []
+            current_width = 0.0
+            for word in paragraph.split():
+                width = _word_width(word, widths, style.fontName, style.fontSize)
+                if current and current_width + space + width > max_width:
+                    lines.append(' '.join(current))
+                    current = [word]
+                    current_width = width
+                else:
+                    current_width += (space if current else 0) + width
+                    current.append(word)
+            if current:
+                lines.append(' '.join(current))
+        return lines
+
+def convert_document(file_path: str, output_path: str, page_size: Tuple[float, float], margin: float) -> Dict[str, Any]:
+    """Convert one .docx file to PDF; returns its output path and timings"""
+    start_time = time.perf_counter()
+    doc = Document(file_path)
+    loaded = time.perf_counter()
+
+    styles = get_styles()
+    story = []
+    body = []
+    paragraphs = 0
+    for paragraph in doc.paragraphs:
+        text = paragraph.text
+        if not text.strip():
+            continue
+        paragraphs += 1
+        # Short all-caps lines are likely titles
+        if len(text) < 100 and text.isupper():
+            if body:
+                story.append(BodyTextBlock(body, styles['normal']))
+                body = []
+            story.append(Paragraph(escape(text), styles['title']))
+        else:
+            body.append(text)
+    if body:
+        story.append(BodyTextBlock(body, styles['normal']))
+    laid_out = time.perf_counter()
+
+    pdf_doc = SimpleDocTemplate(
+        output_path,
+        pagesize=page_size,
+        rightMargin=margin,
+        leftMargin=margin,
+        topMargin=margin,
+        bottomMargin=margin
+    )
+    pdf_doc.build(story)
+    finished = time.perf_counter()
+
+    return {
+        "file": os.path.basename(file_path),
+        "output_path": os.path.basename(output_path),
+        "paragraphs": paragraphs,
+        "pages": pdf_doc.page,
+        "timing_ms": {
+            "load": round((loaded - start_time) * 1000, 1),
+            "layout": round((laid_out - loaded) * 1000, 1),
+            "render": round((finished - laid_out) * 1000, 1),
+            "total": round((finished - start_time) * 1000, 1)
+        }
+    }
+
+def _convert_document_worker(file_path: str, output_path: str, page_size: Tuple[float, float], margin: float) -> Dict[str, Any]:
+    """Process pool entry point: convert one document, reporting failure instead of raising"""
+    try:
+        return convert_document(file_path, output_path, page_size, margin)
+    except Exception as e:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return {"file": os.path.basename(file_path), "error": f"Error converting Word document: {str(e)}"}
 
 class WordToPdfConverter:
+    # Orchestrates on the event loop; each document is converted in the process pool
+    execution_mode = ASYNC
+    
     def __init__(self):
         self.supported_formats = ['.docx']
         self.page_sizes = {
@@ -30,80 +225,65 @@ class WordToPdfConverter:
         if page_size not in self.page_sizes:
             page_size = 'A4'
         
-        converted_files = []
+        word_files = [path for path in file_paths if self._is_word_file(path)]
+        if not word_files:
+            raise ValueError("No valid Word documents found for conversion")
         
-        for file_path in file_paths:
-            if not self._is_word_file(file_path):
-                continue
-            
-            try:
-                # Read Word document
-                doc = Document(file_path)
-                
-                # Generate output filename
-                original_name = os.path.splitext(os.path.basename(file_path))[0]
-                output_filename = f"{original_name}_converted_{uuid.uuid4().hex[:8]}.pdf"
-                output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
-                
-                # Set up PDF document
-                page_size_tuple = self.page_sizes[page_size]
-                if orientation == 'landscape':
-                    page_size_tuple = (page_size_tuple[1], page_size_tuple[0])
-                
-                pdf_doc = SimpleDocTemplate(
-                    output_path,
-                    pagesize=page_size_tuple,
-                    rightMargin=margin,
-                    leftMargin=margin,
-                    topMargin=margin,
-                    bottomMargin=margin
-                )
-                
-                # Build content
-                story = []
-                styles = getSampleStyleSheet()
-                
-                # Create custom styles
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=16,
-                    spaceAfter=30,
-                )
-                
-                normal_style = ParagraphStyle(
-                    'CustomNormal',
-                    parent=styles['Normal'],
-                    fontSize=11,
-                    spaceAfter=12,
-                )
-                
-                # Process Word document content
-                for paragraph in doc.paragraphs:
-                    if paragraph.text.strip():
-                        # Determine style based on content
-                        if len(paragraph.text) < 100 and paragraph.text.isupper():
-                            # Likely a title
-                            p = Paragraph(paragraph.text, title_style)
-                        else:
-                            p = Paragraph(paragraph.text, normal_style)
-                        
-                        story.append(p)
-                        story.append(Spacer(1, 6))
-                
-                # Build PDF
-                pdf_doc.build(story)
-                converted_files.append(output_path)
-                
-            except Exception as e:
-                raise ValueError(f"Error converting Word document {file_path}: {str(e)}")
+        # Set up PDF page
+        page_size_tuple = self.page_sizes[page_size]
+        if orientation == 'landscape':
+            page_size_tuple = (page_size_tuple[1], page_size_tuple[0])
+        
+        os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+        workers = max(1, min(Config.WORD_TO_PDF_WORKERS, cpu_executor.max_workers))
+        
+        # The whole batch is accepted or refused here, so a caller never gets half its documents
+        cpu_executor.check_capacity()
+        
+        # Convert documents in parallel, at most `workers` in flight; gather keeps input order
+        batch_start = time.perf_counter()
+        semaphore = asyncio.Semaphore(workers)
+        
+        async def convert(file_path: str) -> Dict[str, Any]:
+            # Generate output filename
+            original_name = os.path.splitext(os.path.basename(file_path))[0]
+            output_filename = f"{original_name}_converted_{uuid.uuid4().hex[:8]}.pdf"
+            output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
+            async with semaphore:
+                # Losing a worker fails every conversion running in the pool at that moment,
+                # whichever document caused it; the executor starts a new pool, so retry once there
+                for attempt in range(2):
+                    try:
+                        return await cpu_executor.run_subtask(
+                            _convert_document_worker, file_path, output_path, page_size_tuple, margin
+                        )
+                    except BrokenProcessPool as e:
+                        if os.path.exists(output_path):
+                            os.remove(output_path)
+                        if attempt:
+                            return {"file": os.path.basename(file_path), "error": f"Error converting Word document: {str(e)}"}
+        
+        documents = await asyncio.gather(*(convert(path) for path in word_files))
+        batch_time = time.perf_counter() - batch_start
+        
+        converted_files = [document["output_path"] for document in documents if "error" not in document]
+        failed = [document for document in documents if "error" in document]
         
         if not converted_files:
-            raise ValueError("No valid Word documents found for conversion")
+            raise ValueError(f"Error converting Word documents: {failed[0]['error']}")
         
         return {
-            "output_path": os.path.basename(converted_files[0]),
+            "output_path": converted_files[0],
+            "converted_files": converted_files,
             "total_files_processed": len(converted_files),
+            "failed_files": len(failed),
+            "documents": documents,
+            "batch_stats": {
+                "workers": workers,
+                "documents": len(word_files),
+                "total_time": f"{batch_time:.3f}s",
+                "documents_per_second": round(len(word_files) / batch_time, 2) if batch_time > 0 else None
+            },
             "conversion_settings": {
                 "page_size": page_size,
                 "orientation": orientation,
@@ -15,6 +15,9 @@ class FunctionCallResponse(BaseModel):
     message: str
     result_file_path: Optional[str] = None
     function_used: Optional[str] = None
+    cache_hit: bool = False
+    job_id: Optional[str] = None
+    output_files: List[str] = []
     error_details: Optional[str] = None
 
 class ImageCompressionParams(BaseModel):
@@ -287,6 +287,14 @@ document.addEventListener('DOMContentLoaded', function () {
                     </a>
                 </div>
             ` : ''}
+            
+            ${data.job_id && data.output_files && data.output_files.length > 1 ? `
+                <div class="text-center">
+                    <a href="/download-bundle/${data.job_id}" class="download-btn" download>
+                        🗂️ Download All (${data.output_files.length} items, ZIP)
+                    </a>
+                </div>
+            ` : ''}
         `;
 
         resultContent.innerHTML = successHtml;
@@ -483,6 +491,11 @@ document.addEventListener('DOMContentLoaded', function () {
                 formData.append('audio', audioBlob, `recording${fileExtension}`);
                 formData.append('language', 'auto'); // Auto-detect language
                 formData.append('model', 'saarika:v2');
+                // Last detected language narrows the server's auto-detection
+                const previousLanguage = sessionStorage.getItem('lastSpeechLanguageCode');
+                if (previousLanguage) {
+                    formData.append('previous_language', previousLanguage);
+                }
 
                 // Update status
                 speechStatus.textContent = 'Transcribing with Sarvam AI...';
@@ -510,6 +523,10 @@ document.addEventListener('DOMContentLoaded', function () {
                         throw new Error('No transcript in response');
                     }
 
+                    if (result.language_code && result.language_code !== 'unknown') {
+                        sessionStorage.setItem('lastSpeechLanguageCode', result.language_code);
+                    }
+
                     // Add the transcript to the textarea
                     if (promptTextarea.value.trim()) {
                         promptTextarea.value += ' ' + transcript;
@@ -924,6 +941,15 @@ async function translateUIElements(targetLanguage) {
         // Get Sarvam AI language code
         const sarvamLanguageCode = getSarvamLanguageCode(targetLanguage);
 
+        // Prefer the precomputed bundle; it is immutable, so the browser caches it
+        const bundleTranslations = await fetchTranslationBundle(sarvamLanguageCode);
+        if (bundleTranslations) {
+            translationCache[cacheKey] = bundleTranslations;
+            applyTranslations(bundleTranslations);
+            hideTranslationStatus();
+            return;
+        }
+
         // Call our translation API
         const response = await fetch('/api/translate', {
             method: 'POST',
@@ -961,6 +987,25 @@ async function translateUIElements(targetLanguage) {
     }
 }
 
+async function fetchTranslationBundle(sarvamLanguageCode) {
+    const bundles = window.I18N_BUNDLES || {};
+    if (!bundles[sarvamLanguageCode]) {
+        return null;
+    }
+
+    try {
+        const response = await fetch(bundles[sarvamLanguageCode]);
+        if (!response.ok) {
+            return null;
+        }
+        const bundle = await response.json();
+        return bundle.translations || null;
+    } catch (error) {
+        console.log('Translation bundle unavailable:', error);
+        return null;
+    }
+}
+
 function getSarvamLanguageCode(googleTranslateCode) {
     const mapping = {
         'hi': 'hi-IN',
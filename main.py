@@ -1,21 +1,63 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
 import uvicorn
 import os
 import time
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
 from typing import Optional
 
 from app.client.gemini_client import GeminiClient
 from app.client.sarvam_client import SarvamClient
+from app.client.translation_cache import TranslationCache
+from app.client.translation_bundles import TranslationBundles
 from app.functions.function_registry import FunctionRegistry
-from app.file_handler.file_manager import FileManager
+from app.functions.executor import ExecutorBusyError, shutdown_executors
+from app.file_handler.file_manager import FileManager, UploadTooLargeError
+from app.file_handler.result_cache import ResultCache
+from app.file_handler.downloads import file_download_response, bundle_entries, iter_zip
 from app.models.schemas import FunctionCallRequest, FunctionCallResponse
 from app.config import Config
 
-app = FastAPI(title="LLM Function Calling API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop application-wide resources"""
+    if translation_cache is not None:
+        loaded = await asyncio.to_thread(translation_cache.warm)
+        print(f"Translation cache warmed with {loaded} entries")
+    bundle_task = None
+    if translation_bundles is not None:
+        # Built in the background so startup is not blocked on Sarvam
+        bundle_task = asyncio.create_task(_build_translation_bundles())
+    cleanup_task = asyncio.create_task(_cleanup_loop())
+    yield
+    cleanup_task.cancel()
+    if bundle_task is not None and not bundle_task.done():
+        bundle_task.cancel()
+    shutdown_executors()
+
+async def _cleanup_loop():
+    """Delete expired uploads and outputs every CLEANUP_INTERVAL_HOURS"""
+    while True:
+        try:
+            purged = await asyncio.to_thread(file_manager.cleanup_old_files)
+            if purged["deleted"]:
+                print(f"Cleanup removed {purged['deleted']} expired files ({purged['bytes_reclaimed']} bytes)")
+        except Exception as e:
+            print(f"Warning: Cleanup failed: {e}")
+        await asyncio.sleep(max(60, Config.CLEANUP_INTERVAL_HOURS * 3600))
+
+async def _build_translation_bundles():
+    try:
+        await translation_bundles.build(sarvam_client, cache=translation_cache)
+    except Exception as e:
+        print(f"Warning: Could not build UI translation bundles: {e}")
+
+app = FastAPI(title="LLM Function Calling API", version="1.0.0", lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -26,11 +68,15 @@ gemini_client = GeminiClient()
 function_registry = FunctionRegistry()
 file_manager = FileManager()
 sarvam_client = SarvamClient()
+result_cache = ResultCache() if Config.RESULT_CACHE_ENABLED else None
+translation_cache = TranslationCache() if Config.TRANSLATION_CACHE_ENABLED else None
+translation_bundles = TranslationBundles() if Config.UI_BUNDLES_ENABLED else None
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Main interface for the application"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    i18n_bundles = translation_bundles.manifest() if translation_bundles is not None else {}
+    return templates.TemplateResponse("index.html", {"request": request, "i18n_bundles": i18n_bundles})
 
 @app.get("/favicon.ico")
 async def favicon():
@@ -58,6 +104,7 @@ async def test():
 @app.post("/process", response_model=FunctionCallResponse)
 async def process_request(
     request: Request,
+    response: Response,
     prompt: str = Form(...),
     files: list[UploadFile] = File(default=[])
 ):
@@ -66,37 +113,82 @@ async def process_request(
         print(f"Received request - Prompt: {prompt}")
         print(f"Number of files: {len(files)}")
         
-        # Save uploaded files
-        file_paths = []
-        for file in files:
-            if file.filename:
+        timings = {}
+        
+        # Save uploaded files concurrently (hashed while streaming to disk); gather keeps their order
+        stage_start = time.perf_counter()
+        save_semaphore = asyncio.Semaphore(max(1, Config.UPLOAD_SAVE_CONCURRENCY))
+        
+        async def save(file: UploadFile):
+            async with save_semaphore:
                 print(f"Processing file: {file.filename}")
-                file_path = await file_manager.save_upload(file)
-                file_paths.append(file_path)
+                return await file_manager.stream_upload(file)
+        
+        saved_files = await asyncio.gather(*(save(file) for file in files if file.filename))
+        file_paths = [saved["path"] for saved in saved_files]
+        file_hashes = [saved["sha256"] for saved in saved_files]
+        timings["save"] = time.perf_counter() - stage_start
         
         print(f"Saved files: {file_paths}")
         
         # Parse prompt and determine function to call
         print("Calling Gemini client...")
+        stage_start = time.perf_counter()
         function_call = await gemini_client.parse_prompt_for_function(prompt, file_paths)
+        timings["parse"] = time.perf_counter() - stage_start
         print(f"Function call result: {function_call}")
         
-        # Execute the determined function
-        print("Executing function...")
-        result = await function_registry.execute_function(
-            function_call.function_name,
-            function_call.parameters,
-            file_paths
-        )
+        # Reuse the output of an identical earlier request if we still have it
+        result = None
+        cache_key = None
+        if result_cache is not None:
+            cache_key = ResultCache.make_key(function_call.function_name, function_call.parameters, file_hashes, file_paths)
+            result = await asyncio.to_thread(result_cache.get, cache_key)
+            if result is not None:
+                print(f"Result cache hit for {function_call.function_name}")
+        
+        cache_hit = result is not None
+        stage_start = time.perf_counter()
+        if not cache_hit:
+            # Execute the determined function
+            print("Executing function...")
+            result = await function_registry.execute_function(
+                function_call.function_name,
+                function_call.parameters,
+                file_paths
+            )
+            if result_cache is not None:
+                await asyncio.to_thread(result_cache.put, cache_key, result)
+        # Track (or, on a cache hit, extend) the expiry of every output the result points at
+        output_files = await asyncio.to_thread(file_manager.catalog.register_outputs, result)
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(file_manager.catalog.register_job, job_id, output_files)
+        timings["execute"] = time.perf_counter() - stage_start
         print(f"Function result: {result}")
         
+        response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={duration * 1000:.1f}" for stage, duration in timings.items()
+        )
+        
         return FunctionCallResponse(
             success=True,
             message="Processing completed successfully",
             result_file_path=result.get("output_path"),
-            function_used=function_call.function_name
+            function_used=function_call.function_name,
+            cache_hit=cache_hit,
+            job_id=job_id,
+            output_files=output_files
         )
         
+    except UploadTooLargeError as e:
+        print(f"Upload rejected in process_request: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExecutorBusyError as e:
+        print(f"Executor busy in process_request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except TimeoutError as e:
+        print(f"Timeout in process_request: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Error in process_request: {str(e)}")
         import traceback
@@ -104,22 +196,53 @@ async def process_request(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/download/{file_path:path}")
-async def download_file(file_path: str):
-    """Download processed file"""
+async def download_file(file_path: str, request: Request):
+    """Download processed file (supports Range and conditional requests)"""
     # Use absolute path from Config
     full_path = os.path.join(Config.OUTPUT_DIR, os.path.basename(file_path))
     
-    if not os.path.exists(full_path):
+    if not os.path.isfile(full_path):
         print(f"File not found at: {full_path}")
         raise HTTPException(status_code=404, detail=f"File not found: {os.path.basename(file_path)}")
     
-    filename = os.path.basename(full_path)
-    return FileResponse(
-        path=full_path,
-        filename=filename,
-        media_type='application/octet-stream'
+    return await file_download_response(full_path, request.headers)
+
+@app.get("/download-bundle/{job_id}")
+async def download_bundle(job_id: str):
+    """Download every output of a /process request as one ZIP, streamed as it is built"""
+    artifacts = await asyncio.to_thread(file_manager.catalog.get_job, job_id)
+    entries = await asyncio.to_thread(bundle_entries, Config.OUTPUT_DIR, artifacts) if artifacts else []
+    if not entries:
+        raise HTTPException(status_code=404, detail=f"No downloadable outputs for job: {job_id}")
+    
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="outputs_{job_id[:8]}.zip"'}
     )
 
+@app.get("/i18n/{bundle_name}")
+async def get_translation_bundle(bundle_name: str, request: Request):
+    """Serve a precomputed UI translation bundle"""
+    bundle = translation_bundles.get(bundle_name) if translation_bundles is not None else None
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Translation bundle not found")
+
+    headers = {
+        "ETag": bundle["etag"],
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding"
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if bundle["etag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    encoding = translation_bundles.pick_encoding(bundle, request.headers.get("accept-encoding", ""))
+    if encoding != 'identity':
+        headers["Content-Encoding"] = encoding
+    return Response(content=bundle[encoding], media_type="application/json; charset=utf-8", headers=headers)
+
 @app.post("/api/translate")
 async def translate_ui_text(request: Request):
     """Translate UI text to selected language using Sarvam AI"""
@@ -133,26 +256,30 @@ async def translate_ui_text(request: Request):
             return {"success": False, "error": "No texts provided"}
         
         translations = {}
+        pending = {}
         
         for key, text in texts.items():
             if not text or not text.strip():
                 translations[key] = text
-                continue
-                
-            # Use Sarvam AI to translate
-            result = await sarvam_client.translate_text(
-                text=text,
-                source_language=source_language,
-                target_language=target_language
-            )
-            
-            translations[key] = result.get('translated_text', text)
+            else:
+                pending[key] = text
+        
+        # Cached strings come from memory; the rest are deduplicated and translated concurrently
+        batch = await sarvam_client.translate_many(
+            list(pending.values()),
+            source_language=source_language,
+            target_language=target_language,
+            cache=translation_cache
+        )
+        for key, text in pending.items():
+            translations[key] = batch['translations'].get(text, text)
         
         return {
             "success": True,
             "translations": translations,
             "target_language": target_language,
-            "source_language": source_language
+            "source_language": source_language,
+            "stats": batch['stats']
         }
         
     except Exception as e:
@@ -163,11 +290,28 @@ async def translate_ui_text(request: Request):
             "translations": {}
         }
 
+def _language_hints(accept_language: Optional[str], previous_language: Optional[str]) -> list:
+    """Turn the previous detected language and Accept-Language into Sarvam language codes"""
+    mapping = sarvam_client.get_language_mapping()
+    hints = []
+    if previous_language:
+        hints.append(previous_language)
+    for part in (accept_language or "").split(','):
+        tag = part.split(';')[0].strip()
+        if not tag:
+            continue
+        code = tag if tag in mapping.values() else mapping.get(tag.split('-')[0].lower())
+        if code and code not in hints:
+            hints.append(code)
+    return hints
+
 @app.post("/api/sarvam-speech-to-text")
 async def sarvam_speech_to_text(
+    request: Request,
     audio: UploadFile = File(...),
     language: str = Form("auto"),
-    model: str = Form("saarika:v2")
+    model: str = Form("saarika:v2"),
+    previous_language: Optional[str] = Form(None)
 ):
     """Sarvam AI speech-to-text with automatic language detection"""
     try:
@@ -178,14 +322,13 @@ async def sarvam_speech_to_text(
         # Ensure upload directory exists
         os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
         
-        with open(temp_audio_path, "wb") as buffer:
-            content = await audio.read()
-            buffer.write(content)
+        await file_manager.stream_upload(audio, temp_audio_path)
           # Use Sarvam AI for speech-to-text
         result = await sarvam_client.speech_to_text(
             audio_file_path=temp_audio_path,
             language=language,
-            model=model
+            model=model,
+            language_hints=_language_hints(request.headers.get('accept-language'), previous_language)
         )
         
         print(f"Sarvam AI result: {result}")
@@ -214,6 +357,9 @@ async def sarvam_speech_to_text(
                 "message": "Failed to transcribe audio"
             }
             
+    except UploadTooLargeError as e:
+        print(f"Audio upload rejected: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"Error in speech-to-text: {str(e)}")
         return {
@@ -234,7 +380,15 @@ async def health_check():
         "status": "healthy",
         "service": "PROAGENT",
         "version": "1.0.0",
-        "timestamp": time.time()
+        "timestamp": time.time(),
+        "executors": function_registry.get_executor_stats(),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "prompt_cache": gemini_client.get_cache_stats(),
+        "intent_routing": gemini_client.get_routing_stats(),
+        "speech_auto_detect": sarvam_client.get_auto_detect_stats(),
+        "translation_cache": translation_cache.stats() if translation_cache is not None else None,
+        "translation_bundles": translation_bundles.manifest() if translation_bundles is not None else None,
+        "storage": file_manager.catalog.stats()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import zipfile
+
+import pytest
+
+from app.config import Config
+from app.functions.text_replacer import TextReplacer
+
+@pytest.mark.skipif(shutil.which('zip') is None, reason="needs the zip command to build a PKWARE-encrypted archive")
+def test_encrypted_members_still_decrypt(tmp_path, monkeypatch):
+    """Encrypted members are copied as they are and keep working with their password"""
+    monkeypatch.setattr(Config, 'OUTPUT_DIR', str(tmp_path / "outputs"))
+    os.makedirs(Config.OUTPUT_DIR)
+
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    (source_dir / "secret.txt").write_text("IITM secret " * 200)
+    (source_dir / "notes.md").write_text("IITM notes")
+    zip_path = str(tmp_path / "encrypted.zip")
+    subprocess.run(['zip', '-q', '-P', 'pw', zip_path, 'secret.txt', 'notes.md'], cwd=source_dir, check=True)
+    # A plain member next to the encrypted ones is still rewritten
+    with zipfile.ZipFile(zip_path, 'a') as archive:
+        archive.writestr("plain.txt", "IITM plain")
+
+    with zipfile.ZipFile(zip_path) as archive:
+        assert archive.getinfo("secret.txt").flag_bits & 0x09 == 0x09
+
+    result = asyncio.run(TextReplacer().execute({"find_text": "IITM", "replace_text": "IIT Madras"}, [zip_path]))
+
+    output_path = os.path.join(Config.OUTPUT_DIR, result["output_path"])
+    with zipfile.ZipFile(output_path) as archive:
+        assert archive.read("secret.txt", pwd=b"pw") == b"IITM secret " * 200
+        assert archive.read("notes.md", pwd=b"pw") == b"IITM notes"
+        assert archive.read("plain.txt") == b"IIT Madras plain"
+
+    if shutil.which('unzip') is not None:
+        subprocess.run(['unzip', '-q', '-t', '-P', 'pw', output_path], check=True)